@@ -22,16 +22,6 @@ import argparse
 import sys
 from pathlib import Path
 
-# Explicitly disable CUDA before any imports to avoid NVML warnings
-# This must be set at the very beginning
-os.environ["CUDA_VISIBLE_DEVICES"] = ""
-
-# Add project root to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-# Import from core module (single source of truth)
-from core.config import settings
-
 try:
     from colorama import init, Fore, Style
     init()
@@ -42,8 +32,30 @@ except ImportError:
         RESET_ALL = DIM = BRIGHT = ""
 
 
+def _bootstrap() -> None:
+    """Process-wide setup, only when run as a script (not on import)."""
+    # Explicitly disable CUDA before any imports to avoid NVML warnings
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    # Add project root to path for imports
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
 def main():
     """Main entry point for the CLI."""
+    # Import from core module (single source of truth)
+    from core.config import settings, default_thread_count, MAX_DEFAULT_THREADS
+
+    # Resolve all config-backed defaults once into a plain dict; they are
+    # used both as argparse defaults and inside help strings.
+    defaults = settings.model_dump(include={
+        "chat_model_filename", "chat_model_dir", "chat_context_length",
+        "chat_n_threads", "chat_n_gpu_layers", "chat_n_batch",
+        "chat_n_ubatch", "chat_flash_attn", "chat_use_mmap", "chat_use_mlock",
+        "chat_prompt_cache_bytes",
+        "image_model_id",
+        "image_inference_steps", "default_image_size", "vision_model_id",
+    })
+
     parser = argparse.ArgumentParser(
         description="Qwen3 Interactive Chat with Thinking Mode",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -61,8 +73,8 @@ Examples:
   # Start with an image for visual Q&A
   python -m cli.main --input-image ./photo.jpg
 
-Default model: {settings.chat_model_filename}
-Model directory: {settings.chat_model_dir}
+Default model: {defaults['chat_model_filename']}
+Model directory: {defaults['chat_model_dir']}
         """
     )
 
@@ -73,25 +85,67 @@ Model directory: {settings.chat_model_dir}
         default=None,
         help="Path to the GGUF model file (default: use config settings)"
     )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only use local/cached models, never contact HuggingFace"
+    )
 
     # Performance options
     parser.add_argument(
         "--ctx", "-c",
         type=int,
-        default=settings.chat_context_length,
-        help=f"Context window size (default: {settings.chat_context_length})"
+        default=defaults["chat_context_length"],
+        help=f"Context window size (default: {defaults['chat_context_length']})"
     )
     parser.add_argument(
         "--threads", "-t",
         type=int,
-        default=settings.chat_n_threads if settings.chat_n_threads > 0 else None,
-        help="Number of CPU threads (default: auto)"
+        default=defaults["chat_n_threads"] if defaults["chat_n_threads"] > 0 else None,
+        help=f"Number of CPU threads (default: physical cores capped at {MAX_DEFAULT_THREADS}, here {default_thread_count()})"
     )
     parser.add_argument(
         "--gpu-layers", "-g",
         type=int,
-        default=settings.chat_n_gpu_layers,
-        help=f"Number of layers to offload to GPU (default: {settings.chat_n_gpu_layers})"
+        default=defaults["chat_n_gpu_layers"] or 0,
+        help=f"Number of layers to offload to GPU, -1 = all (default: {defaults['chat_n_gpu_layers'] or 0}; "
+             "an unset or auto config value means CPU only here)"
+    )
+    parser.add_argument(
+        "--batch", "-b",
+        type=int,
+        default=defaults["chat_n_batch"],
+        help=f"Prompt processing batch size (default: {defaults['chat_n_batch']})"
+    )
+    parser.add_argument(
+        "--ubatch",
+        type=int,
+        default=defaults["chat_n_ubatch"],
+        help=f"Physical micro-batch size (default: {defaults['chat_n_ubatch']})"
+    )
+    parser.add_argument(
+        "--no-flash-attn",
+        action="store_true",
+        default=not defaults["chat_flash_attn"],
+        help="Disable FlashAttention kernels"
+    )
+    parser.add_argument(
+        "--no-mmap",
+        action="store_true",
+        default=not defaults["chat_use_mmap"],
+        help="Read the model into RAM instead of memory-mapping it"
+    )
+    parser.add_argument(
+        "--mlock",
+        action="store_true",
+        default=defaults["chat_use_mlock"],
+        help="Lock the model in RAM to prevent swapping"
+    )
+    parser.add_argument(
+        "--prompt-cache",
+        type=int,
+        default=defaults["chat_prompt_cache_bytes"] >> 20,
+        help=f"RAM in MiB for KV state reused across turns, 0 = off (default: {defaults['chat_prompt_cache_bytes'] >> 20})"
     )
     parser.add_argument(
         "--verbose", "-v",
@@ -105,21 +159,21 @@ Model directory: {settings.chat_model_dir}
     image_group.add_argument(
         "--image-model",
         type=str,
-        default=settings.image_model_id,
-        help=f"Text-to-image model ID (default: {settings.image_model_id})"
+        default=defaults["image_model_id"],
+        help=f"Text-to-image model ID (default: {defaults['image_model_id']})"
     )
     image_group.add_argument(
         "--image-steps",
         type=int,
-        default=settings.image_inference_steps,
-        help=f"Number of inference steps for image generation (default: {settings.image_inference_steps})"
+        default=defaults["image_inference_steps"],
+        help=f"Number of inference steps for image generation (default: {defaults['image_inference_steps']})"
     )
     image_group.add_argument(
         "--image-size",
         type=int,
-        default=settings.default_image_size,
+        default=defaults["default_image_size"],
         choices=[256, 384, 512, 640, 768],
-        help=f"Generated image size in pixels (default: {settings.default_image_size})"
+        help=f"Generated image size in pixels (default: {defaults['default_image_size']})"
     )
     image_group.add_argument(
         "--no-image",
@@ -139,8 +193,8 @@ Model directory: {settings.chat_model_dir}
     vision_group.add_argument(
         "--vision-model",
         type=str,
-        default=settings.vision_model_id,
-        help=f"Vision model ID (default: {settings.vision_model_id})"
+        default=defaults["vision_model_id"],
+        help=f"Vision model ID (default: {defaults['vision_model_id']})"
     )
     vision_group.add_argument(
         "--no-vision",
@@ -150,33 +204,33 @@ Model directory: {settings.chat_model_dir}
 
     args = parser.parse_args()
 
-    # Determine model path
-    if args.model:
-        # User specified a custom model path
-        model_path = args.model
-        if not Path(model_path).exists():
-            print(f"{Fore.RED}Error: Model file not found: {model_path}{Style.RESET_ALL}")
-            sys.exit(1)
-    else:
-        # Use default model from config (auto-download if not exists)
-        try:
-            print(f"{Fore.CYAN}Loading model from config...{Style.RESET_ALL}")
-            model_path = settings.get_chat_model_path()
-            print(f"{Fore.GREEN}Model ready: {model_path}{Style.RESET_ALL}")
-        except RuntimeError as e:
-            print(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
-            sys.exit(1)
+    if args.offline:
+        settings.chat_model_offline = True
+
+    # Validate a user-specified model path up front (cheap check).
+    # The default model is resolved (and downloaded if needed) lazily
+    # by QwenChat on the first chat message.
+    model_path = args.model
+    if model_path and not Path(model_path).exists():
+        print(f"{Fore.RED}Error: Model file not found: {model_path}{Style.RESET_ALL}")
+        sys.exit(1)
 
     # Import QwenChat from core module
     from core.qwen_chat import QwenChat
 
-    # Create chat instance
+    # Create chat instance (model is loaded on first use)
     chat = QwenChat(
         model_path=model_path,
         n_ctx=args.ctx,
         n_threads=args.threads,
         n_gpu_layers=args.gpu_layers,
         verbose=args.verbose,
+        n_batch=args.batch,
+        n_ubatch=args.ubatch,
+        flash_attn=not args.no_flash_attn,
+        use_mmap=not args.no_mmap,
+        use_mlock=args.mlock,
+        prompt_cache_bytes=args.prompt_cache << 20,
     )
 
     # Configure image generation
@@ -204,4 +258,5 @@ Model directory: {settings.chat_model_dir}
 
 
 if __name__ == "__main__":
+    _bootstrap()
     main()
@@ -12,13 +12,17 @@ Modules:
 - qwen_vision: QwenVisionHandler for image understanding with Qwen2-VL
 - text2img: Text2ImageGenerator for image generation with LCM-SD1.5
 
+The model handlers pull in llama_cpp / torch / diffusers, so they are
+imported lazily on first attribute access (PEP 562). Importing core.config
+(e.g. for `python -m cli.main --help`) stays cheap.
+
 Author: Generated with love by Harei-chan
 """
 
+import importlib
+from typing import TYPE_CHECKING
+
 from core.config import settings
-from core.qwen_chat import QwenChat
-from core.qwen_vision import QwenVisionHandler
-from core.text2img import Text2ImageGenerator
 from core.log_listener import (
     LogListener,
     LogLevel,
@@ -27,6 +31,29 @@ from core.log_listener import (
     create_log_forwarder,
 )
 
+if TYPE_CHECKING:
+    from core.qwen_chat import QwenChat
+    from core.qwen_vision import QwenVisionHandler
+    from core.text2img import Text2ImageGenerator
+
+# Heavy exports resolved on first access: name -> module
+_LAZY_IMPORTS = {
+    "QwenChat": "core.qwen_chat",
+    "QwenVisionHandler": "core.qwen_vision",
+    "Text2ImageGenerator": "core.text2img",
+}
+
+
+def __getattr__(name: str):
+    """Import heavy model handlers on first access."""
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value  # Cache so __getattr__ is not hit again
+    return value
+
+
 __all__ = [
     "settings",
     "QwenChat",
@@ -10,7 +10,7 @@ Features:
 - Intercept any logger (including uvicorn, watchfiles, etc.)
 - Register callbacks by log level or keyword
 - Chain-style API for fluent configuration
-- Thread-safe callback dispatch
+- Thread-safe, lock-free callback dispatch
 - Does not affect original log output
 
 Author: Generated with love by Harei-chan
@@ -29,12 +29,20 @@ Usage:
             .start()
 """
 
+import functools
+import itertools
 import logging
 import re
 import threading
-from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Set
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    # Optional: single-pass multi-keyword matching (pip install pyahocorasick)
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
 
 
 class LogLevel(Enum):
@@ -46,23 +54,106 @@ class LogLevel(Enum):
     CRITICAL = logging.CRITICAL
 
 
-@dataclass
 class LogRecord:
-    """Data structure for log records."""
-    logger_name: str
-    level: int
-    level_name: str
-    message: str
-    timestamp: float
-    pathname: str
-    lineno: int
-    func_name: str
-    extra: Dict[str, Any] = field(default_factory=dict)
+    """
+    Data structure for log records.
+
+    When built from a logging.LogRecord (``source``), ``message`` is
+    formatted lazily on first access, so callbacks that only look at the
+    level never pay for %-formatting the message.
+    """
+
+    __slots__ = (
+        "logger_name", "level", "level_name", "_message", "timestamp",
+        "pathname", "lineno", "func_name", "extra", "_source",
+    )
+
+    def __init__(
+        self,
+        logger_name: str,
+        level: int,
+        level_name: str,
+        message: Optional[str],
+        timestamp: float,
+        pathname: str,
+        lineno: int,
+        func_name: str,
+        extra: Optional[Dict[str, Any]] = None,
+        source: Optional[logging.LogRecord] = None,
+    ):
+        self.logger_name = logger_name
+        self.level = level
+        self.level_name = level_name
+        self._message = message
+        self.timestamp = timestamp
+        self.pathname = pathname
+        self.lineno = lineno
+        self.func_name = func_name
+        self.extra = extra if extra is not None else {}
+        self._source = source
+
+    @property
+    def message(self) -> str:
+        """The formatted log message (computed on first access)."""
+        if self._message is None:
+            self._message = self._source.getMessage() if self._source is not None else ""
+            self._source = None
+        return self._message
+
+    def __repr__(self) -> str:
+        return (
+            f"LogRecord(logger_name={self.logger_name!r}, level={self.level}, "
+            f"level_name={self.level_name!r}, message={self.message!r})"
+        )
 
 
 # Callback function type
 LogCallback = Callable[[LogRecord], None]
 
+# Characters that make a keyword a real regex rather than a plain substring
+_REGEX_METACHARS = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+# Below this many literal keywords, per-keyword `in` checks are faster
+# than an Aho-Corasick scan
+_AHOCORASICK_MIN_KEYWORDS = 3
+
+
+def _make_automaton(words: set) -> Optional[Any]:
+    """Build an Aho-Corasick automaton whose values are the matched words."""
+    if not words:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_keyword_automata(keyword_callbacks: Dict[str, Tuple[tuple, ...]]) -> Optional[tuple]:
+    """
+    Build automata for all literal keywords so one scan finds every hit.
+
+    Returns:
+        (keyword_callbacks, case_sensitive_automaton, case_insensitive_automaton),
+        or None if pyahocorasick is unavailable or there are too few literals.
+        The registry is included so dispatch can check the automata belong
+        to the snapshot it is iterating.
+    """
+    if not HAS_AHOCORASICK:
+        return None
+    literals_cs: set = set()
+    literals_ci: set = set()
+    for entries in keyword_callbacks.values():
+        for _, case_sensitive, _, literal in entries:
+            if literal is None:
+                continue
+            if not literal:
+                return None  # Empty keyword always matches; keep the simple path
+            (literals_cs if case_sensitive else literals_ci).add(literal)
+    if len(literals_cs) + len(literals_ci) < _AHOCORASICK_MIN_KEYWORDS:
+        return None
+    return keyword_callbacks, _make_automaton(literals_cs), _make_automaton(literals_ci)
+
 
 class CallbackHandler(logging.Handler):
     """
@@ -76,22 +167,29 @@ class CallbackHandler(logging.Handler):
 
     def emit(self, record: logging.LogRecord) -> None:
         """Process log record and trigger corresponding callbacks."""
+        # Skip building the record (and %-formatting the message) when no
+        # registered callback could possibly fire for it
+        if not self._listener._has_callbacks_for(record.levelno):
+            return
         log_record = LogRecord(
             logger_name=record.name,
             level=record.levelno,
             level_name=record.levelname,
-            message=record.getMessage(),
+            message=None,  # Formatted lazily from source on first access
             timestamp=record.created,
             pathname=record.pathname,
             lineno=record.lineno,
             func_name=record.funcName,
+            source=record,
         )
         self._listener._dispatch_callbacks(log_record)
 
 
 class LogListener:
     """
-    Log Listener - Singleton pattern for global log interception.
+    Log Listener - global log interception.
+
+    Use get_log_listener() to obtain the shared process-wide instance.
 
     Features:
     - Intercept any logger (including uvicorn, watchfiles, etc.)
@@ -101,7 +199,7 @@ class LogListener:
     - Thread-safe
 
     Usage:
-        listener = LogListener()
+        listener = get_log_listener()
 
         # Watch specific loggers
         listener.watch("uvicorn.error")
@@ -117,23 +215,21 @@ class LogListener:
         listener.start()
     """
 
-    _instance: Optional["LogListener"] = None
-    _lock = threading.Lock()
-
-    def __new__(cls) -> "LogListener":
-        """Singleton pattern ensures only one listener instance globally."""
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
-
-    def __init__(self):
-        if self._initialized:
-            return
+    def __init__(self, max_keyword_callbacks: int = 0, max_watched_loggers: int = 0):
+        """
+        Args:
+            max_keyword_callbacks: Maximum number of distinct keywords; the least
+                                   recently used keyword (registered or matched)
+                                   is evicted on overflow (0 = unbounded)
+            max_watched_loggers: Maximum number of watched loggers; the least
+                                 recently watched logger is unwatched on
+                                 overflow (0 = unbounded)
+        """
+        self.max_keyword_callbacks = max_keyword_callbacks
+        self.max_watched_loggers = max_watched_loggers
 
-        self._watched_loggers: Set[str] = set()
+        # Insertion-ordered (dict as ordered set) so the oldest entry can be evicted
+        self._watched_loggers: Dict[str, None] = {}
         self._handlers: Dict[str, CallbackHandler] = {}
 
         # Intercept mode settings
@@ -141,16 +237,22 @@ class LogListener:
         self._original_handlers: Dict[str, List[logging.Handler]] = {}
         self._original_propagate: Dict[str, bool] = {}
 
-        # Callback registries
-        self._level_callbacks: Dict[int, List[LogCallback]] = {}
-        self._keyword_callbacks: Dict[str, List[tuple]] = {}  # (callback, case_sensitive)
-        self._global_callbacks: List[LogCallback] = []
+        # Callback registries (copy-on-write: mutations replace the whole
+        # dict/tuple under _callback_lock, so dispatch can read them lock-free)
+        self._level_callbacks: Dict[int, Tuple[LogCallback, ...]] = {}
+        self._keyword_callbacks: Dict[str, Tuple[tuple, ...]] = {}  # (callback, case_sensitive, pattern, literal)
+        self._global_callbacks: Tuple[LogCallback, ...] = ()
+        self._keyword_automata: Optional[tuple] = None  # See _build_keyword_automata
+        # Keyword -> tick of its last registration or match, for LRU eviction.
+        # Kept outside the copy-on-write registry so dispatch can refresh it
+        # with a plain dict store instead of republishing the registry.
+        self._keyword_last_used: Dict[str, int] = {}
+        self._keyword_tick = itertools.count()
 
         # Running state
         self._running = False
         self._callback_lock = threading.Lock()
-
-        self._initialized = True
+        self._attach_lock = threading.Lock()
 
     # =========================================================================
     # Public API - Watch Configuration
@@ -168,11 +270,16 @@ class LogListener:
         Returns:
             self for method chaining
         """
-        self._watched_loggers.add(logger_name)
+        # Re-watching moves the logger to the most-recent position
+        self._watched_loggers.pop(logger_name, None)
+        self._watched_loggers[logger_name] = None
         self._intercept_settings[logger_name] = intercept
+        if self.max_watched_loggers > 0:
+            while len(self._watched_loggers) > self.max_watched_loggers:
+                self.unwatch(next(iter(self._watched_loggers)))
         # If already running, attach handler immediately
-        if self._running and logger_name not in self._handlers:
-            self._attach_handler(logger_name)
+        if self._running:
+            self._attach_watched()
         return self
 
     def unwatch(self, logger_name: str) -> "LogListener":
@@ -185,7 +292,7 @@ class LogListener:
         Returns:
             self for method chaining
         """
-        self._watched_loggers.discard(logger_name)
+        self._watched_loggers.pop(logger_name, None)
         if logger_name in self._handlers:
             self._detach_handler(logger_name)
         self._intercept_settings.pop(logger_name, None)
@@ -223,6 +330,7 @@ class LogListener:
     ) -> "LogListener":
         """
         Register a callback triggered by log level.
+        Registering the same callback for a level again is a no-op.
 
         Args:
             level: Log level
@@ -232,9 +340,13 @@ class LogListener:
             self for method chaining
         """
         with self._callback_lock:
-            if level.value not in self._level_callbacks:
-                self._level_callbacks[level.value] = []
-            self._level_callbacks[level.value].append(callback)
+            if callback in self._level_callbacks.get(level.value, ()):
+                return self
+            level_callbacks = dict(self._level_callbacks)
+            level_callbacks[level.value] = level_callbacks.get(level.value, ()) + (callback,)
+            self._level_callbacks = level_callbacks
+        if self._running:
+            self._attach_watched()
         return self
 
     def on_keyword(
@@ -245,6 +357,7 @@ class LogListener:
     ) -> "LogListener":
         """
         Register a callback triggered by keyword matching.
+        Registering the same callback for a keyword again is a no-op.
 
         Args:
             keyword: Keyword to match (supports regex)
@@ -254,15 +367,40 @@ class LogListener:
         Returns:
             self for method chaining
         """
+        # Plain substrings are matched with `in` (much cheaper than the regex
+        # engine); real regexes are compiled once here
+        if _REGEX_METACHARS.search(keyword):
+            literal = None
+            pattern = re.compile(keyword, 0 if case_sensitive else re.IGNORECASE)
+        else:
+            literal = keyword if case_sensitive else keyword.lower()
+            pattern = None
         with self._callback_lock:
-            if keyword not in self._keyword_callbacks:
-                self._keyword_callbacks[keyword] = []
-            self._keyword_callbacks[keyword].append((callback, case_sensitive))
+            if any(
+                entry[0] == callback and entry[1] == case_sensitive
+                for entry in self._keyword_callbacks.get(keyword, ())
+            ):
+                return self
+            keyword_callbacks = dict(self._keyword_callbacks)
+            keyword_callbacks[keyword] = keyword_callbacks.get(keyword, ()) + (
+                (callback, case_sensitive, pattern, literal),
+            )
+            last_used = self._keyword_last_used
+            last_used[keyword] = next(self._keyword_tick)
+            if self.max_keyword_callbacks > 0:
+                while len(keyword_callbacks) > self.max_keyword_callbacks:
+                    victim = min(keyword_callbacks, key=lambda kw: last_used.get(kw, -1))
+                    del keyword_callbacks[victim]
+                    last_used.pop(victim, None)
+            self._set_keyword_callbacks(keyword_callbacks)
+        if self._running:
+            self._attach_watched()
         return self
 
     def on_any(self, callback: LogCallback) -> "LogListener":
         """
         Register a global callback that triggers for all captured logs.
+        Registering the same callback again is a no-op.
 
         Args:
             callback: Callback function
@@ -271,7 +409,11 @@ class LogListener:
             self for method chaining
         """
         with self._callback_lock:
-            self._global_callbacks.append(callback)
+            if callback in self._global_callbacks:
+                return self
+            self._global_callbacks = self._global_callbacks + (callback,)
+        if self._running:
+            self._attach_watched()
         return self
 
     def off_level(
@@ -291,13 +433,15 @@ class LogListener:
         """
         with self._callback_lock:
             if level.value in self._level_callbacks:
-                if callback is None:
-                    self._level_callbacks[level.value] = []
+                level_callbacks = dict(self._level_callbacks)
+                remaining = () if callback is None else tuple(
+                    cb for cb in level_callbacks[level.value] if cb != callback
+                )
+                if remaining:
+                    level_callbacks[level.value] = remaining
                 else:
-                    self._level_callbacks[level.value] = [
-                        cb for cb in self._level_callbacks[level.value]
-                        if cb != callback
-                    ]
+                    del level_callbacks[level.value]
+                self._level_callbacks = level_callbacks
         return self
 
     def off_keyword(
@@ -317,13 +461,17 @@ class LogListener:
         """
         with self._callback_lock:
             if keyword in self._keyword_callbacks:
-                if callback is None:
-                    self._keyword_callbacks[keyword] = []
+                keyword_callbacks = dict(self._keyword_callbacks)
+                remaining = () if callback is None else tuple(
+                    entry for entry in keyword_callbacks[keyword]
+                    if entry[0] != callback
+                )
+                if remaining:
+                    keyword_callbacks[keyword] = remaining
                 else:
-                    self._keyword_callbacks[keyword] = [
-                        (cb, cs) for cb, cs in self._keyword_callbacks[keyword]
-                        if cb != callback
-                    ]
+                    del keyword_callbacks[keyword]
+                    self._keyword_last_used.pop(keyword, None)
+                self._set_keyword_callbacks(keyword_callbacks)
         return self
 
     def off_any(self, callback: Optional[LogCallback] = None) -> "LogListener":
@@ -338,19 +486,20 @@ class LogListener:
         """
         with self._callback_lock:
             if callback is None:
-                self._global_callbacks = []
+                self._global_callbacks = ()
             else:
-                self._global_callbacks = [
+                self._global_callbacks = tuple(
                     cb for cb in self._global_callbacks if cb != callback
-                ]
+                )
         return self
 
     def clear_callbacks(self) -> "LogListener":
         """Clear all registered callbacks."""
         with self._callback_lock:
-            self._level_callbacks.clear()
-            self._keyword_callbacks.clear()
-            self._global_callbacks.clear()
+            self._level_callbacks = {}
+            self._set_keyword_callbacks({})
+            self._keyword_last_used = {}
+            self._global_callbacks = ()
         return self
 
     # =========================================================================
@@ -362,15 +511,16 @@ class LogListener:
         Start log listening.
         Attaches handlers to all registered loggers.
 
+        Listen-only (non-intercept) handlers are deferred until at least one
+        callback is registered, since they would have nothing to dispatch to.
+
         Returns:
             self for method chaining
         """
         if self._running:
             return self
 
-        for logger_name in self._watched_loggers:
-            if logger_name not in self._handlers:
-                self._attach_handler(logger_name)
+        self._attach_watched()
 
         self._running = True
         return self
@@ -398,10 +548,59 @@ class LogListener:
         """Check if the listener is currently running."""
         return self._running
 
+    def stats(self) -> Dict[str, int]:
+        """
+        Get registry sizes, useful for spotting unbounded accumulation.
+
+        Returns:
+            Dictionary with counts of watched loggers, attached handlers,
+            keywords and callbacks
+        """
+        keyword_callbacks = self._keyword_callbacks
+        return {
+            "watched_loggers": len(self._watched_loggers),
+            "handlers": len(self._handlers),
+            "keywords": len(keyword_callbacks),
+            "keyword_callbacks": sum(len(cbs) for cbs in keyword_callbacks.values()),
+            "level_callbacks": sum(len(cbs) for cbs in self._level_callbacks.values()),
+            "global_callbacks": len(self._global_callbacks),
+        }
+
     # =========================================================================
     # Internal Methods
     # =========================================================================
 
+    def _has_any_callbacks(self) -> bool:
+        """Check whether any callback is registered."""
+        return bool(
+            self._global_callbacks
+            or self._level_callbacks
+            or self._keyword_callbacks
+        )
+
+    def _attach_watched(self) -> None:
+        """Attach handlers to watched loggers that do not have one yet.
+
+        Intercepting handlers are always attached because they are what
+        blocks the original output. Listen-only handlers are skipped while
+        no callbacks exist and picked up once the first one is registered.
+        """
+        # Fast path (no locks) once every watched logger has its handler,
+        # e.g. for callbacks registered after start()
+        if len(self._handlers) >= len(self._watched_loggers):
+            return
+        has_callbacks = self._has_any_callbacks()
+        # Hold the logging module lock (an RLock, re-entered by getLogger and
+        # addHandler) across the whole batch: one acquire instead of one per
+        # logger, and no other thread can log or reconfigure in between
+        with self._attach_lock, logging._lock:
+            for logger_name in list(self._watched_loggers):
+                if logger_name in self._handlers:
+                    continue
+                if not has_callbacks and not self._intercept_settings.get(logger_name, False):
+                    continue
+                self._attach_handler(logger_name)
+
     def _attach_handler(self, logger_name: str) -> None:
         """Attach a callback handler to the specified logger."""
         logger = logging.getLogger(logger_name)
@@ -443,24 +642,74 @@ class LogListener:
             logger.propagate = self._original_propagate[logger_name]
             del self._original_propagate[logger_name]
 
+    def _has_callbacks_for(self, level: int) -> bool:
+        """Cheap check whether any callback could fire for a record at this level."""
+        return bool(
+            self._global_callbacks
+            or self._keyword_callbacks
+            or self._level_callbacks.get(level)
+        )
+
+    def _set_keyword_callbacks(self, keyword_callbacks: Dict[str, Tuple[tuple, ...]]) -> None:
+        """Publish a new keyword registry and its matcher (call under _callback_lock)."""
+        self._keyword_automata = _build_keyword_automata(keyword_callbacks)
+        self._keyword_callbacks = keyword_callbacks
+
     def _dispatch_callbacks(self, record: LogRecord) -> None:
-        """Dispatch log record to corresponding callbacks."""
-        with self._callback_lock:
-            # 1. Trigger global callbacks
-            for callback in self._global_callbacks:
-                self._safe_call(callback, record)
-
-            # 2. Trigger level callbacks
-            if record.level in self._level_callbacks:
-                for callback in self._level_callbacks[record.level]:
-                    self._safe_call(callback, record)
-
-            # 3. Trigger keyword callbacks
-            for keyword, callbacks in self._keyword_callbacks.items():
-                for callback, case_sensitive in callbacks:
-                    message = record.message if case_sensitive else record.message.lower()
-                    pattern = keyword if case_sensitive else keyword.lower()
-                    if re.search(pattern, message):
+        """Dispatch log record to corresponding callbacks.
+
+        Takes a snapshot of the immutable registries instead of holding
+        _callback_lock, so slow callbacks (or callbacks that log to a watched
+        logger themselves) never block or deadlock other log calls.
+        """
+        global_callbacks = self._global_callbacks
+        level_callbacks = self._level_callbacks
+        keyword_callbacks = self._keyword_callbacks
+
+        # 1. Trigger global callbacks
+        for callback in global_callbacks:
+            self._safe_call(callback, record)
+
+        # 2. Trigger level callbacks
+        for callback in level_callbacks.get(record.level, ()):
+            self._safe_call(callback, record)
+
+        # 3. Trigger keyword callbacks (literal or precompiled in on_keyword).
+        # Case-insensitive literals share one lowercased copy of the message.
+        if keyword_callbacks:
+            message = record.message
+            message_lower = None
+
+            # With many literal keywords, find all hits in one Aho-Corasick
+            # pass and turn the per-keyword checks into set lookups
+            hits_cs = hits_ci = None
+            automata = self._keyword_automata
+            if automata is not None and automata[0] is keyword_callbacks:
+                _, automaton_cs, automaton_ci = automata
+                hits_cs = {kw for _, kw in automaton_cs.iter(message)} if automaton_cs else set()
+                if automaton_ci:
+                    message_lower = message.lower()
+                    hits_ci = {kw for _, kw in automaton_ci.iter(message_lower)}
+                else:
+                    hits_ci = set()
+
+            # Recency is only tracked when the registry is bounded
+            last_used = self._keyword_last_used if self.max_keyword_callbacks > 0 else None
+            for keyword, callbacks in keyword_callbacks.items():
+                for callback, case_sensitive, pattern, literal in callbacks:
+                    if literal is None:
+                        matched = pattern.search(message) is not None
+                    elif hits_cs is not None:
+                        matched = literal in (hits_cs if case_sensitive else hits_ci)
+                    elif case_sensitive:
+                        matched = literal in message
+                    else:
+                        if message_lower is None:
+                            message_lower = message.lower()
+                        matched = literal in message_lower
+                    if matched:
+                        if last_used is not None:
+                            last_used[keyword] = next(self._keyword_tick)
                         self._safe_call(callback, record)
 
     def _safe_call(self, callback: LogCallback, record: LogRecord) -> None:
@@ -476,8 +725,9 @@ class LogListener:
 # Convenience Functions
 # =============================================================================
 
+@functools.lru_cache(maxsize=1)
 def get_log_listener() -> LogListener:
-    """Get the global LogListener instance."""
+    """Get the global LogListener instance (created on first call)."""
     return LogListener()
 
 
@@ -505,6 +755,9 @@ def create_log_forwarder(target_logger: logging.Logger) -> LogCallback:
                 .start()
     """
     def forwarder(record: LogRecord) -> None:
+        # Check the level first: a dropped record is never formatted
+        if not target_logger.isEnabledFor(record.level):
+            return
         target_logger.log(record.level, record.message)
     return forwarder
 
@@ -11,12 +11,12 @@ Author: Generated with love by Harei-chan (￣▽￣)ノ
 """
 
 import logging
-import os
 import sys
-import re
 import time
 from pathlib import Path
-from typing import Optional, Generator, TYPE_CHECKING
+from typing import Final, Optional, Generator, TYPE_CHECKING
+
+from core.config import default_thread_count
 
 if TYPE_CHECKING:
     from core.text2img import Text2ImageGenerator
@@ -36,26 +36,40 @@ def _check_interactive() -> bool:
         return False
     return True
 
-_is_interactive = _check_interactive()
+# Evaluated once at import; the run mode cannot change within a process
+_IS_INTERACTIVE: Final[bool] = _check_interactive()
 
 try:
-    from llama_cpp import Llama
+    from llama_cpp import Llama, LlamaRAMCache
 except ImportError:
     logger.error("llama-cpp-python not installed! Please run: pip install llama-cpp-python")
     sys.exit(1)
 
-try:
-    from colorama import init, Fore, Style
-    init()
-    HAS_COLORAMA = True
-except ImportError:
-    HAS_COLORAMA = False
+# Colors are only useful on an interactive terminal; skip importing (and
+# init(), which wraps stdout on Windows) when running as a service
+HAS_COLORAMA = False
+if _IS_INTERACTIVE:
+    try:
+        from colorama import init, Fore, Style
+        init()
+        HAS_COLORAMA = True
+    except ImportError:
+        pass
+
+if not HAS_COLORAMA:
     # Fallback: define empty color codes
     class Fore:
         CYAN = YELLOW = GREEN = RED = MAGENTA = BLUE = WHITE = ""
     class Style:
         RESET_ALL = DIM = BRIGHT = ""
 
+# Color sequences used on every chat turn, resolved once at import
+_C_RESET = Style.RESET_ALL
+_C_THINKING = f"{Style.DIM}{Fore.WHITE}"
+_THINKING_HEADER = f"\n{Fore.YELLOW}💭 Thinking...{_C_RESET}"
+_ANSWER_PREFIX = f"\n{Fore.GREEN}🤖 Qwen:{_C_RESET} "
+_USER_PROMPT = f"\n{Fore.BLUE}You:{_C_RESET} "
+
 
 # ============================================================================
 # Configuration
@@ -70,6 +84,15 @@ SAMPLING_PARAMS = {
     "max_tokens": 8192,
 }
 
+# Stop sequences ending an assistant turn
+STOP_SEQUENCES = ["<|im_end|>", "<|endoftext|>"]
+
+# Upper bound for /drafts N
+MAX_DRAFTS = 8
+
+# Minimum seconds between stdout flushes while streaming tokens (~1 frame)
+STREAM_FLUSH_INTERVAL = 0.016
+
 # Qwen3 chat template
 CHAT_TEMPLATE = """<|im_start|>system
 You are Qwen, a helpful assistant. You should think step by step before answering.<|im_end|>
@@ -79,6 +102,112 @@ You are Qwen, a helpful assistant. You should think step by step before answerin
 <think>
 """
 
+# Static pieces of CHAT_TEMPLATE around the history and user input
+_TEMPLATE_SYSTEM, _, _rest = CHAT_TEMPLATE.partition("{history}")
+_TEMPLATE_USER_OPEN, _, _TEMPLATE_TURN_CLOSE = _rest.partition("{user_input}")
+del _rest
+
+# Thinking block markers in model output
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+
+
+# Image generation progress bar: every possible fill level, prebuilt
+_PROGRESS_BAR_LEN = 30
+_PROGRESS_BARS = tuple(
+    "█" * filled + "░" * (_PROGRESS_BAR_LEN - filled)
+    for filled in range(_PROGRESS_BAR_LEN + 1)
+)
+_PROGRESS_TEMPLATE = f"\r{Fore.CYAN}Progress: [%s] %.0f%% (Step %d/%d){_C_RESET}"
+
+class _StreamSplitter:
+    """
+    Split a streamed completion into thinking and answer text.
+
+    The prompt already opens <think>, so the stream starts in the thinking
+    state and switches to the answer state at the first </think>. Each
+    chunk is scanned once; a short lookback catches a tag that straddles
+    two chunks.
+    """
+
+    __slots__ = ("in_thinking", "thinking", "answer", "_tail")
+
+    def __init__(self):
+        self.in_thinking = True
+        self.thinking: list[str] = []
+        self.answer: list[str] = []
+        self._tail = ""  # Unclassified text that may begin a </think>
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the part of it that is answer text."""
+        if not self.in_thinking:
+            self.answer.append(chunk)
+            return chunk
+
+        window = self._tail + chunk
+        idx = window.find(_THINK_CLOSE)
+        if idx < 0:
+            keep = len(_THINK_CLOSE) - 1
+            if len(window) > keep:
+                self.thinking.append(window[:-keep])
+                window = window[-keep:]
+            self._tail = window
+            return ""
+
+        self.thinking.append(window[:idx])
+        self._tail = ""
+        self.in_thinking = False
+        remaining = window[idx + len(_THINK_CLOSE):]
+        if remaining:
+            self.answer.append(remaining)
+        return remaining
+
+    def finish(self) -> None:
+        """Flush held-back lookback text at the end of the stream."""
+        if self._tail:
+            self.thinking.append(self._tail)
+            self._tail = ""
+
+    def text(self) -> str:
+        """Reassemble the full raw completion."""
+        thinking = "".join(self.thinking)
+        if self.in_thinking:
+            return thinking
+        return f"{thinking}{_THINK_CLOSE}{''.join(self.answer)}"
+
+
+# Static /help text, rendered once at import
+_HELP_TEXT = f"""
+{Fore.CYAN}╭─────────────────────────────────────────╮
+│         Available Commands              │
+╰─────────────────────────────────────────╯{Style.RESET_ALL}
+
+{Fore.CYAN}General:{Style.RESET_ALL}
+  {Fore.GREEN}/quit{Style.RESET_ALL}, {Fore.GREEN}/exit{Style.RESET_ALL}    - Exit the program
+  {Fore.GREEN}/clear{Style.RESET_ALL}           - Clear conversation history
+  {Fore.GREEN}/help{Style.RESET_ALL}            - Show this help message
+  {Fore.GREEN}/history{Style.RESET_ALL}         - Show conversation history
+  {Fore.GREEN}/drafts N <msg>{Style.RESET_ALL}   - Generate N alternative answers
+
+{Fore.CYAN}Image Generation (Text → Image):{Style.RESET_ALL}
+  {Fore.GREEN}/image <prompt>{Style.RESET_ALL}   - Generate image from text
+
+{Fore.CYAN}Vision (Image → Text):{Style.RESET_ALL}
+  {Fore.GREEN}/vision <path>{Style.RESET_ALL}    - Load image for visual Q&A
+  {Fore.GREEN}/ask <question>{Style.RESET_ALL}   - Ask about the loaded image
+  {Fore.GREEN}/queue <question>{Style.RESET_ALL} - Queue a question for /flush
+  {Fore.GREEN}/flush{Style.RESET_ALL}            - Ask all queued questions at once
+  {Fore.GREEN}/clear_vision{Style.RESET_ALL}     - Clear image, back to text mode
+
+{Fore.CYAN}Tips:{Style.RESET_ALL}
+  - The model will think step-by-step before answering
+  - Thinking process is shown in dimmed text
+  - Press Ctrl+C to interrupt generation
+  - Image generation takes ~30-60 seconds on CPU
+  - Vision Q&A takes ~1-2 minutes on CPU
+
+"""
+
 
 # ============================================================================
 # QwenChat Class
@@ -89,24 +218,50 @@ class QwenChat:
 
     def __init__(
         self,
-        model_path: str,
+        model_path: Optional[str] = None,
         n_ctx: int = 8192,
         n_threads: Optional[int] = None,
         n_gpu_layers: int = 0,
         verbose: bool = False,
+        n_batch: int = 2048,
+        n_ubatch: int = 512,
+        flash_attn: bool = True,
+        use_mmap: bool = True,
+        use_mlock: bool = False,
+        prompt_cache_bytes: int = 512 << 20,
     ):
         """
-        Initialize the chat model.
+        Initialize the chat handler.
+
+        The model itself is loaded lazily on the first chat turn, so the
+        CLI can show its banner and answer commands like /help immediately.
 
         Args:
-            model_path: Path to the GGUF model file
+            model_path: Path to the GGUF model file (None = resolve from config,
+                        downloading from HuggingFace if necessary)
             n_ctx: Context window size
-            n_threads: Number of CPU threads (None = auto)
+            n_threads: Number of CPU threads for decode and prefill (None =
+                       physical cores, capped at MAX_DEFAULT_THREADS; an explicit
+                       value is used as-is)
             n_gpu_layers: Number of layers to offload to GPU (0 = CPU only)
             verbose: Whether to show llama.cpp logs
+            n_batch: Logical batch size for prompt processing (prefill)
+            n_ubatch: Physical micro-batch size submitted to the backend
+            flash_attn: Use fused FlashAttention kernels (ignored by builds
+                        without FlashAttention support)
+            use_mmap: Memory-map the model file instead of reading it into RAM
+            use_mlock: Lock model pages in RAM so they are never swapped out
+            prompt_cache_bytes: RAM budget for KV-state snapshots reused
+                                across chat turns (0 = off)
         """
         self.model_path = model_path
         self.messages: list[dict] = []
+        # Rendered chat-template segments, one per entry in self.messages
+        self._history_parts: list[str] = []
+        # Token ids for each entry in self._history_parts
+        self._history_tokens: list[list[int]] = []
+        # Token ids of the static template pieces (set on first use)
+        self._scaffold_tokens: Optional[tuple[list[int], list[int], list[int]]] = None
         self.verbose = verbose
 
         # Text-to-image generator (lazy loaded)
@@ -126,41 +281,145 @@ class QwenChat:
         }
         self.in_vision_mode: bool = False
         self.startup_image: Optional[str] = None
+        # Rendered banner, keyed by the settings it displays
+        self._banner_cache: Optional[tuple[tuple, str]] = None
+        # Questions queued with /queue, answered together by /flush
+        self._pending_questions: list[str] = []
+
+        # Llama model (lazy loaded on first chat turn)
+        self._llm: Optional[Llama] = None
+        self._is_loading = False
+        self._prompt_cache_bytes = prompt_cache_bytes
+        n_threads = n_threads or default_thread_count()
+        self._llm_kwargs: dict = {
+            "n_ctx": n_ctx,
+            "n_threads": n_threads,
+            "n_threads_batch": n_threads,
+            "n_gpu_layers": n_gpu_layers,
+            "n_batch": n_batch,
+            "n_ubatch": n_ubatch,
+            "flash_attn": flash_attn,
+            "use_mmap": use_mmap,
+            "use_mlock": use_mlock,
+            "verbose": verbose,
+        }
+
+    @property
+    def is_loaded(self) -> bool:
+        """Check if the model is loaded."""
+        return self._llm is not None
 
-        logger.info(f"Loading model: {model_path}")
-        if _is_interactive:
-            print(f"{Fore.CYAN}Loading model: {model_path}{Style.RESET_ALL}")
-            print(f"{Fore.YELLOW}This may take a moment...{Style.RESET_ALL}\n")
+    def _load_model(self) -> None:
+        """
+        Resolve the model file and load it with llama-cpp-python.
 
+        This method implements lazy loading - the model is only loaded
+        when the first chat message is sent, not at initialization.
+
+        Raises:
+            RuntimeError: If the model could not be resolved or loaded
+        """
+        if self._llm is not None or self._is_loading:
+            return
+
+        self._is_loading = True
         try:
-            self.llm = Llama(
-                model_path=model_path,
-                n_ctx=n_ctx,
-                n_threads=n_threads or os.cpu_count(),
-                n_gpu_layers=n_gpu_layers,
-                verbose=verbose,
-            )
+            if self.model_path is None:
+                from core.config import settings
+
+                print(f"{Fore.CYAN}Loading model from config...{Style.RESET_ALL}")
+                # Raises RuntimeError if the model can't be found or downloaded
+                self.model_path = settings.get_chat_model_path()
+                print(f"{Fore.GREEN}Model ready: {self.model_path}{Style.RESET_ALL}")
+
+            logger.info("Loading model: %s", self.model_path)
+            if _IS_INTERACTIVE:
+                print(f"{Fore.CYAN}Loading model: {self.model_path}{Style.RESET_ALL}")
+                print(f"{Fore.YELLOW}This may take a moment...{Style.RESET_ALL}\n")
+
+            try:
+                self._llm = Llama(model_path=self.model_path, **self._llm_kwargs)
+                # Keep KV state between turns so only the newly appended part of
+                # the growing chat prompt has to be prefilled.
+                if self._prompt_cache_bytes > 0:
+                    self._llm.set_cache(LlamaRAMCache(capacity_bytes=self._prompt_cache_bytes))
+            except Exception as e:
+                self._llm = None
+                raise RuntimeError(f"Failed to load model: {e}") from e
+
             logger.info("Model loaded successfully!")
-            if _is_interactive:
+            if _IS_INTERACTIVE:
                 print(f"{Fore.GREEN}Model loaded successfully!{Style.RESET_ALL}\n")
-        except Exception as e:
-            logger.error(f"Failed to load model: {e}")
-            if _is_interactive:
-                print(f"{Fore.RED}Failed to load model: {e}{Style.RESET_ALL}")
-            sys.exit(1)
+        finally:
+            # Also on failure or Ctrl+C, so the next chat turn retries
+            self._is_loading = False
+
+    def _get_llm(self) -> Llama:
+        """
+        Get the Llama instance, loading if necessary.
+
+        Raises:
+            RuntimeError: If the model could not be resolved or loaded
+        """
+        if self._llm is None:
+            self._load_model()
+        if self._llm is None:
+            raise RuntimeError("Model is not loaded")
+        return self._llm
+
+    def _refresh_history_parts(self) -> list[str]:
+        """Bring self._history_parts up to date with self.messages.
+
+        Messages already rendered on earlier turns are reused; only newly
+        appended messages are formatted.
+        """
+        parts = self._history_parts
+        if len(parts) > len(self.messages):
+            # History was cleared or replaced since the last turn
+            parts.clear()
+        for msg in self.messages[len(parts):]:
+            role = msg["role"]
+            if role in ("user", "assistant"):
+                parts.append(f"<|im_start|>{role}\n{msg['content']}<|im_end|>\n")
+            else:
+                parts.append("")  # Keep parts aligned with self.messages
+        return parts
 
     def _build_prompt(self, user_input: str) -> str:
         """Build the full prompt with chat history."""
-        history = ""
-        for msg in self.messages:
-            role = msg["role"]
-            content = msg["content"]
-            if role == "user":
-                history += f"<|im_start|>user\n{content}<|im_end|>\n"
-            elif role == "assistant":
-                history += f"<|im_start|>assistant\n{content}<|im_end|>\n"
+        parts = self._refresh_history_parts()
+        return CHAT_TEMPLATE.format(history="".join(parts), user_input=user_input)
+
+    def _build_prompt_tokens(self, llm: Llama, user_input: str) -> list[int]:
+        """Build the prompt for _build_prompt(user_input) as token ids.
+
+        The static template pieces are tokenized once per model and history
+        messages once each, so only the new user input is tokenized per turn.
+        """
+        if self._scaffold_tokens is None:
+            self._scaffold_tokens = (
+                llm.tokenize(_TEMPLATE_SYSTEM.encode("utf-8"), add_bos=True, special=True),
+                llm.tokenize(_TEMPLATE_USER_OPEN.encode("utf-8"), add_bos=False, special=True),
+                llm.tokenize(_TEMPLATE_TURN_CLOSE.encode("utf-8"), add_bos=False, special=True),
+            )
+        system, user_open, turn_close = self._scaffold_tokens
+
+        parts = self._refresh_history_parts()
+        history = self._history_tokens
+        if len(history) > len(parts):
+            history.clear()
+        for part in parts[len(history):]:
+            history.append(
+                llm.tokenize(part.encode("utf-8"), add_bos=False, special=True) if part else []
+            )
 
-        return CHAT_TEMPLATE.format(history=history, user_input=user_input)
+        tokens = list(system)
+        for message_tokens in history:
+            tokens.extend(message_tokens)
+        tokens.extend(user_open)
+        tokens.extend(llm.tokenize(user_input.encode("utf-8"), add_bos=False, special=True))
+        tokens.extend(turn_close)
+        return tokens
 
     def _parse_thinking(self, text: str) -> tuple[str, str]:
         """
@@ -169,26 +428,18 @@ class QwenChat:
         Returns:
             (thinking_content, final_answer)
         """
-        # Pattern to match <think>...</think> or just </think>
-        think_pattern = re.compile(r"<think>(.*?)</think>", re.DOTALL)
-        match = think_pattern.search(text)
-
-        if match:
-            thinking = match.group(1).strip()
-            # Get content after </think>
-            answer = text[match.end():].strip()
-            return thinking, answer
-
-        # If no think tags found, check if text starts with thinking content
-        # (since we add <think> in the prompt)
-        if "</think>" in text:
-            parts = text.split("</think>", 1)
-            thinking = parts[0].strip()
-            answer = parts[1].strip() if len(parts) > 1 else ""
-            return thinking, answer
-
-        # No thinking detected
-        return "", text.strip()
+        end = text.find(_THINK_CLOSE)
+        if end < 0:
+            # No thinking detected
+            return "", text.strip()
+
+        answer = text[end + len(_THINK_CLOSE):].strip()
+        # The prompt already opens <think>, so the output usually only
+        # contains the closing tag
+        start = text.find(_THINK_OPEN, 0, end)
+        if start < 0:
+            return text[:end].strip(), answer
+        return text[start + len(_THINK_OPEN):end].strip(), answer
 
     def generate_stream(self, user_input: str) -> Generator[str, None, None]:
         """
@@ -197,19 +448,20 @@ class QwenChat:
         Yields:
             Chunks of generated text
         """
-        prompt = self._build_prompt(user_input)
+        llm = self._get_llm()
 
         if self.verbose:
+            prompt = self._build_prompt(user_input)
             print(f"\n{Fore.MAGENTA}[DEBUG] Prompt:{Style.RESET_ALL}\n{prompt}\n")
 
-        stream = self.llm(
-            prompt,
+        stream = llm(
+            self._build_prompt_tokens(llm, user_input),
             max_tokens=SAMPLING_PARAMS["max_tokens"],
             temperature=SAMPLING_PARAMS["temperature"],
             top_p=SAMPLING_PARAMS["top_p"],
             top_k=SAMPLING_PARAMS["top_k"],
             repeat_penalty=SAMPLING_PARAMS["repeat_penalty"],
-            stop=["<|im_end|>", "<|endoftext|>"],
+            stop=STOP_SEQUENCES,
             stream=True,
         )
 
@@ -217,6 +469,80 @@ class QwenChat:
             chunk = output["choices"][0]["text"]
             yield chunk
 
+    def generate_many(self, prompts: list[str]) -> list[str]:
+        """
+        Generate complete (non-streamed) responses for several prompts.
+
+        Prompts run one after another on the same context, not as a batch:
+        the high-level llama-cpp-python API decodes a single sequence. A
+        prompt that shares a prefix with the previous one (e.g. the same
+        chat history) only prefills the part after it.
+
+        Args:
+            prompts: Fully built prompts (see _build_prompt)
+
+        Returns:
+            Raw model output for each prompt, in order
+        """
+        llm = self._get_llm()
+        results = []
+        for prompt in prompts:
+            output = llm(
+                prompt,
+                max_tokens=SAMPLING_PARAMS["max_tokens"],
+                temperature=SAMPLING_PARAMS["temperature"],
+                top_p=SAMPLING_PARAMS["top_p"],
+                top_k=SAMPLING_PARAMS["top_k"],
+                repeat_penalty=SAMPLING_PARAMS["repeat_penalty"],
+                stop=STOP_SEQUENCES,
+            )
+            results.append(output["choices"][0]["text"])
+        return results
+
+    def show_drafts(self, count: int, user_input: str) -> None:
+        """
+        Generate several alternative answers to one message.
+
+        Drafts are not added to the conversation history.
+
+        Args:
+            count: Number of drafts to generate
+            user_input: User's input message
+        """
+        prompt = self._build_prompt(user_input)
+        print(f"\n{Fore.CYAN}Generating {count} drafts...{Style.RESET_ALL}")
+
+        start_time = time.perf_counter()
+        outputs = self.generate_many([prompt] * count)
+        elapsed = time.perf_counter() - start_time
+
+        for i, output in enumerate(outputs, 1):
+            _, answer = self._parse_thinking(output)
+            print(f"\n{Fore.GREEN}🤖 Draft {i}:{Style.RESET_ALL} {answer}")
+        print(f"\n{Style.DIM}(Response time: {elapsed:.1f}s){Style.RESET_ALL}")
+
+    @staticmethod
+    def _stream_writer():
+        """
+        Get (write, flush) callables for streaming text to stdout.
+
+        Writes go straight to the underlying byte buffer, skipping print()'s
+        per-call overhead; the caller decides when to flush.
+        """
+        stdout = sys.stdout
+        raw = getattr(stdout, "buffer", None)
+        if raw is None:
+            return stdout.write, stdout.flush
+
+        stdout.flush()  # Drain pending text-layer output before raw writes
+        encoding = stdout.encoding or "utf-8"
+        raw_write = raw.write
+
+        def write(text: str) -> None:
+            raw_write(text.encode(encoding, "replace"))
+
+        return write, raw.flush
+
     def chat_once(self, user_input: str) -> str:
         """
         Process a single chat turn with streaming output.
@@ -227,97 +553,71 @@ class QwenChat:
         Returns:
             The assistant's full response
         """
-        full_response = ""
-        thinking_content = ""
-        answer_content = ""
-        in_thinking = True
-        thinking_printed = False
+        splitter = _StreamSplitter()
 
-        print(f"\n{Fore.YELLOW}💭 Thinking...{Style.RESET_ALL}")
+        print(_THINKING_HEADER)
 
-        buffer = ""
-        for chunk in self.generate_stream(user_input):
-            buffer += chunk
-            full_response += chunk
+        write = flush = None
+        last_flush = 0.0
 
-            # Check if we've exited thinking mode
-            if in_thinking and "</think>" in buffer:
-                in_thinking = False
-                # Split at </think>
-                parts = buffer.split("</think>", 1)
-                thinking_content = parts[0]
-                remaining = parts[1] if len(parts) > 1 else ""
+        for chunk in self.generate_stream(user_input):
+            if splitter.in_thinking:
+                remaining = splitter.feed(chunk)
+                if splitter.in_thinking:
+                    continue
 
-                # Print thinking content (dimmed)
-                if thinking_content.strip():
-                    print(f"\n{Style.DIM}{Fore.WHITE}{thinking_content.strip()}{Style.RESET_ALL}")
+                # Just crossed </think>: print thinking content (dimmed)
+                thinking_content = "".join(splitter.thinking).strip()
+                if thinking_content:
+                    print(f"\n{_C_THINKING}{thinking_content}{_C_RESET}")
 
-                print(f"\n{Fore.GREEN}🤖 Qwen:{Style.RESET_ALL} ", end="", flush=True)
-                thinking_printed = True
+                print(_ANSWER_PREFIX, end="", flush=True)
+                write, flush = self._stream_writer()
+                last_flush = time.monotonic()
 
                 # Print any remaining content after </think>
                 if remaining:
-                    print(remaining, end="", flush=True)
-                    answer_content = remaining
-
-                buffer = ""
-            elif not in_thinking:
-                # We're in answer mode, print directly
-                print(chunk, end="", flush=True)
-                answer_content += chunk
-
-        # Handle case where </think> was never found
-        if in_thinking:
-            thinking_content, answer_content = self._parse_thinking(full_response)
-            if thinking_content:
-                print(f"\n{Style.DIM}{Fore.WHITE}{thinking_content}{Style.RESET_ALL}")
-            print(f"\n{Fore.GREEN}🤖 Qwen:{Style.RESET_ALL} {answer_content}")
+                    write(remaining)
+                    flush()
+            else:
+                # We're in answer mode, write directly and flush at most
+                # once per STREAM_FLUSH_INTERVAL
+                splitter.feed(chunk)
+                write(chunk)
+                now = time.monotonic()
+                if now - last_flush > STREAM_FLUSH_INTERVAL:
+                    flush()
+                    last_flush = now
+
+        if flush is not None:
+            flush()
+
+        splitter.finish()
+
+        # Handle case where </think> was never found: it is all answer
+        if splitter.in_thinking:
+            clean_answer = "".join(splitter.thinking).strip()
+            print(f"{_ANSWER_PREFIX}{clean_answer}")
         else:
             print()  # Final newline
+            clean_answer = "".join(splitter.answer).strip()
 
         # Store in history (only the answer, not thinking)
         self.messages.append({"role": "user", "content": user_input})
-
-        # Clean up the response for history
-        _, clean_answer = self._parse_thinking(full_response)
         self.messages.append({"role": "assistant", "content": clean_answer})
 
-        return full_response
+        return splitter.text()
 
     def clear_history(self):
         """Clear conversation history."""
         self.messages = []
+        self._history_parts = []
+        self._history_tokens = []
         print(f"{Fore.YELLOW}Conversation history cleared.{Style.RESET_ALL}")
 
     def show_help(self):
         """Display help information."""
-        help_text = f"""
-{Fore.CYAN}╭─────────────────────────────────────────╮
-│         Available Commands              │
-╰─────────────────────────────────────────╯{Style.RESET_ALL}
-
-{Fore.CYAN}General:{Style.RESET_ALL}
-  {Fore.GREEN}/quit{Style.RESET_ALL}, {Fore.GREEN}/exit{Style.RESET_ALL}    - Exit the program
-  {Fore.GREEN}/clear{Style.RESET_ALL}           - Clear conversation history
-  {Fore.GREEN}/help{Style.RESET_ALL}            - Show this help message
-  {Fore.GREEN}/history{Style.RESET_ALL}         - Show conversation history
-
-{Fore.CYAN}Image Generation (Text → Image):{Style.RESET_ALL}
-  {Fore.GREEN}/image <prompt>{Style.RESET_ALL}   - Generate image from text
-
-{Fore.CYAN}Vision (Image → Text):{Style.RESET_ALL}
-  {Fore.GREEN}/vision <path>{Style.RESET_ALL}    - Load image for visual Q&A
-  {Fore.GREEN}/ask <question>{Style.RESET_ALL}   - Ask about the loaded image
-  {Fore.GREEN}/clear_vision{Style.RESET_ALL}     - Clear image, back to text mode
-
-{Fore.CYAN}Tips:{Style.RESET_ALL}
-  - The model will think step-by-step before answering
-  - Thinking process is shown in dimmed text
-  - Press Ctrl+C to interrupt generation
-  - Image generation takes ~30-60 seconds on CPU
-  - Vision Q&A takes ~1-2 minutes on CPU
-"""
-        print(help_text)
+        sys.stdout.write(_HELP_TEXT)
 
     def show_history(self):
         """Display conversation history."""
@@ -358,23 +658,24 @@ class QwenChat:
                 self.text2img = Text2ImageGenerator(
                     model_id=self.image_config["model_id"],
                     num_inference_steps=self.image_config["num_inference_steps"],
+                    static_shape=(self.image_config["image_size"],) * 2,
                 )
             except ImportError as e:
-                logger.error(f"Import error: {e}")
-                if _is_interactive:
+                logger.error("Import error: %s", e)
+                if _IS_INTERACTIVE:
                     print(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
                     print("Please install: pip install diffusers transformers accelerate pillow torch")
                 return
             except Exception as e:
-                logger.error(f"Failed to initialize image generator: {e}")
-                if _is_interactive:
+                logger.error("Failed to initialize image generator: %s", e)
+                if _IS_INTERACTIVE:
                     print(f"{Fore.RED}Failed to initialize image generator: {e}{Style.RESET_ALL}")
                 return
 
         print(f"\n{Fore.CYAN}Generating image...{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}Prompt: {prompt}{Style.RESET_ALL}\n")
 
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         try:
             output_path = self.text2img.generate_and_save(
@@ -384,28 +685,26 @@ class QwenChat:
                 progress_callback=self._image_progress_callback,
             )
 
-            elapsed = time.time() - start_time
+            elapsed = time.perf_counter() - start_time
             print()  # New line after progress bar
             print(f"\n{Fore.GREEN}Image saved: {output_path}{Style.RESET_ALL}")
             print(f"{Fore.YELLOW}Time: {elapsed:.1f}s{Style.RESET_ALL}")
 
         except KeyboardInterrupt:
             logger.info("Image generation interrupted by user")
-            if _is_interactive:
+            if _IS_INTERACTIVE:
                 print(f"\n{Fore.YELLOW}[Image generation interrupted]{Style.RESET_ALL}")
         except Exception as e:
-            logger.error(f"Image generation failed: {e}")
-            if _is_interactive:
+            logger.error("Image generation failed: %s", e)
+            if _IS_INTERACTIVE:
                 print(f"\n{Fore.RED}Image generation failed: {e}{Style.RESET_ALL}")
 
     def _image_progress_callback(self, step: int, total: int, latents) -> None:
         """Progress callback for image generation."""
-        progress = (step + 1) / total * 100
-        bar_len = 30
-        filled = int(bar_len * (step + 1) / total)
-        bar = '█' * filled + '░' * (bar_len - filled)
-        print(f"\r{Fore.CYAN}Progress: [{bar}] {progress:.0f}% (Step {step+1}/{total}){Style.RESET_ALL}",
-              end='', flush=True)
+        done = step + 1
+        bar = _PROGRESS_BARS[_PROGRESS_BAR_LEN * done // total]
+        sys.stdout.write(_PROGRESS_TEMPLATE % (bar, done / total * 100, done, total))
+        sys.stdout.flush()
 
     # =========================================================================
     # Vision (Image Understanding) Methods
@@ -434,14 +733,14 @@ class QwenChat:
                 )
                 self.vision_handler.load_model()
             except ImportError as e:
-                logger.error(f"Import error: {e}")
-                if _is_interactive:
+                logger.error("Import error: %s", e)
+                if _IS_INTERACTIVE:
                     print(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
                     print("Please install: pip install transformers qwen-vl-utils accelerate")
                 return
             except Exception as e:
-                logger.error(f"Failed to initialize vision model: {e}")
-                if _is_interactive:
+                logger.error("Failed to initialize vision model: %s", e)
+                if _IS_INTERACTIVE:
                     print(f"{Fore.RED}Failed to initialize vision model: {e}{Style.RESET_ALL}")
                 return
 
@@ -474,20 +773,70 @@ class QwenChat:
         print(f"{Fore.YELLOW}This may take 1-2 minutes on CPU.{Style.RESET_ALL}\n")
 
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
             response = self.vision_handler.ask(question)
-            elapsed = time.time() - start_time
+            elapsed = time.perf_counter() - start_time
 
             print(f"{Fore.GREEN}🤖 Qwen-VL:{Style.RESET_ALL} {response}")
             print(f"\n{Style.DIM}(Response time: {elapsed:.1f}s){Style.RESET_ALL}")
 
         except KeyboardInterrupt:
             logger.info("Vision query interrupted by user")
-            if _is_interactive:
+            if _IS_INTERACTIVE:
                 print(f"\n{Fore.YELLOW}[Interrupted]{Style.RESET_ALL}")
         except Exception as e:
-            logger.error(f"Vision query error: {e}")
-            if _is_interactive:
+            logger.error("Vision query error: %s", e)
+            if _IS_INTERACTIVE:
+                print(f"\n{Fore.RED}Error: {e}{Style.RESET_ALL}")
+
+    def queue_question(self, question: str) -> None:
+        """
+        Queue a question about the loaded image for the next /flush.
+
+        Args:
+            question: The question to queue
+        """
+        if not self.in_vision_mode or self.vision_handler is None:
+            print(f"{Fore.RED}No image loaded. Use /vision <path> first.{Style.RESET_ALL}")
+            return
+
+        self._pending_questions.append(question)
+        print(f"{Fore.GREEN}Queued ({len(self._pending_questions)} pending). "
+              f"Use /flush to ask all at once.{Style.RESET_ALL}")
+
+    def flush_questions(self) -> None:
+        """Ask all queued questions about the image in a single generation."""
+        if not self._pending_questions:
+            print(f"{Fore.YELLOW}No queued questions. Use /queue <question> first.{Style.RESET_ALL}")
+            return
+
+        if not self.in_vision_mode or self.vision_handler is None:
+            print(f"{Fore.RED}No image loaded. Use /vision <path> first.{Style.RESET_ALL}")
+            return
+
+        questions = self._pending_questions
+        self._pending_questions = []
+
+        print(f"\n{Fore.CYAN}🤔 Analyzing image ({len(questions)} questions)...{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}This may take 1-2 minutes on CPU.{Style.RESET_ALL}\n")
+
+        try:
+            start_time = time.perf_counter()
+            answers = self.vision_handler.ask_batch(questions)
+            elapsed = time.perf_counter() - start_time
+
+            for i, (question, answer) in enumerate(zip(questions, answers), 1):
+                print(f"{Fore.BLUE}[{i}] {question}{Style.RESET_ALL}")
+                print(f"{Fore.GREEN}🤖 Qwen-VL:{Style.RESET_ALL} {answer}\n")
+            print(f"{Style.DIM}(Response time: {elapsed:.1f}s){Style.RESET_ALL}")
+
+        except KeyboardInterrupt:
+            logger.info("Vision query interrupted by user")
+            if _IS_INTERACTIVE:
+                print(f"\n{Fore.YELLOW}[Interrupted]{Style.RESET_ALL}")
+        except Exception as e:
+            logger.error("Vision query error: %s", e)
+            if _IS_INTERACTIVE:
                 print(f"\n{Fore.RED}Error: {e}{Style.RESET_ALL}")
 
     def clear_vision_mode(self) -> None:
@@ -496,6 +845,7 @@ class QwenChat:
             self.vision_handler.clear()
 
         self.in_vision_mode = False
+        self._pending_questions = []
         print(f"{Fore.GREEN}✅ Vision mode cleared. Back to text chat.{Style.RESET_ALL}")
 
     def run(self):
@@ -508,7 +858,7 @@ class QwenChat:
 
         while True:
             try:
-                user_input = input(f"\n{Fore.BLUE}You:{Style.RESET_ALL} ").strip()
+                user_input = input(_USER_PROMPT).strip()
 
                 if not user_input:
                     continue
@@ -552,6 +902,25 @@ class QwenChat:
                         else:
                             question = parts[1].strip()
                             self.ask_about_image(question)
+                    elif cmd.startswith("/queue"):
+                        # Queue a question about the loaded image
+                        parts = user_input.split(maxsplit=1)
+                        if len(parts) < 2 or not parts[1].strip():
+                            print(f"{Fore.RED}Usage: /queue <question>{Style.RESET_ALL}")
+                            print(f"Example: /queue What colors are used?")
+                        else:
+                            self.queue_question(parts[1].strip())
+                    elif cmd == "/flush":
+                        self.flush_questions()
+                    elif cmd.startswith("/drafts"):
+                        # Generate N alternative answers
+                        parts = user_input.split(maxsplit=2)
+                        if (len(parts) < 3 or not parts[1].isdigit()
+                                or not 1 <= int(parts[1]) <= MAX_DRAFTS):
+                            print(f"{Fore.RED}Usage: /drafts <1-{MAX_DRAFTS}> <message>{Style.RESET_ALL}")
+                            print(f"Example: /drafts 3 write a haiku about autumn")
+                        else:
+                            self.show_drafts(int(parts[1]), parts[2].strip())
                     elif cmd == "/clear_vision":
                         self.clear_vision_mode()
                     else:
@@ -565,14 +934,27 @@ class QwenChat:
             except KeyboardInterrupt:
                 print(f"\n{Fore.YELLOW}[Interrupted]{Style.RESET_ALL}")
                 continue
+            except RuntimeError as e:
+                # Model could not be loaded; keep the session (and history)
+                logger.error("%s", e)
+                print(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
+                continue
             except EOFError:
                 print(f"\n{Fore.YELLOW}Goodbye! (￣▽￣)ノ{Style.RESET_ALL}")
                 break
 
     def _print_banner(self):
-        """Print welcome banner."""
+        """Print welcome banner (rendered once per configuration)."""
+        key = (self.image_enabled, self.vision_enabled, self.model_path)
+        if self._banner_cache is None or self._banner_cache[0] != key:
+            self._banner_cache = (key, self._render_banner())
+        sys.stdout.write(self._banner_cache[1])
+
+    def _render_banner(self) -> str:
+        """Render the welcome banner for the current configuration."""
         image_status = f"{Fore.GREEN}Enabled{Style.RESET_ALL}" if self.image_enabled else f"{Fore.RED}Disabled{Style.RESET_ALL}"
         vision_status = f"{Fore.GREEN}Enabled{Style.RESET_ALL}" if self.vision_enabled else f"{Fore.RED}Disabled{Style.RESET_ALL}"
+        model_display = self.model_path or "default from config (loaded on first message)"
         banner = f"""
 {Fore.CYAN}╭─────────────────────────────────────────────────╮
 │  🤖 Qwen3 Interactive Chat (Thinking Mode)       │
@@ -581,11 +963,12 @@ class QwenChat:
 │  👁️ Vision: Qwen2-VL [{vision_status}{Fore.CYAN}]                    │
 ╰─────────────────────────────────────────────────╯{Style.RESET_ALL}
 
-{Fore.YELLOW}Model:{Style.RESET_ALL} {self.model_path}
+{Fore.YELLOW}Model:{Style.RESET_ALL} {model_display}
 {Fore.YELLOW}Commands:{Style.RESET_ALL} /quit, /clear, /help, /history, /image, /vision
 
 {Style.DIM}Thinking process will be shown in dimmed text.{Style.RESET_ALL}
 {Style.DIM}Use /image <prompt> to generate images.{Style.RESET_ALL}
 {Style.DIM}Use /vision <path> to analyze images.{Style.RESET_ALL}
+
 """
-        print(banner)
+        return banner
@@ -7,13 +7,15 @@ A vision processing module based on transformers, optimized for CPU inference.
 Author: Generated with love by Harei-chan (￣▽￣)ノ
 """
 
+import functools
 import gc
 import logging
 import os
 import sys
+import threading
 import time
 from pathlib import Path
-from typing import Optional, Generator, List, Dict, Any, TYPE_CHECKING
+from typing import Optional, Generator, List, Dict, Any, Tuple, TYPE_CHECKING
 
 # Setup logger for non-interactive output
 logger = logging.getLogger(__name__)
@@ -33,6 +35,16 @@ def _check_interactive() -> bool:
 
 _is_interactive = _check_interactive()
 
+try:
+    from core.config import cpu_supports_bf16, physical_cpu_count
+except ImportError:
+    # Standalone script mode
+    def cpu_supports_bf16() -> bool:
+        return False
+
+    def physical_cpu_count() -> int:
+        return os.cpu_count() or 4
+
 try:
     import torch
     HAS_TORCH = True
@@ -48,11 +60,18 @@ except ImportError:
     Image = None
 
 try:
-    from transformers import Qwen2VLForConditionalGeneration, AutoProcessor
+    from transformers import Qwen2VLForConditionalGeneration, AutoProcessor, BatchFeature
     HAS_TRANSFORMERS = True
 except ImportError:
     HAS_TRANSFORMERS = False
 
+try:
+    import bitsandbytes  # noqa: F401
+    from transformers import BitsAndBytesConfig
+    HAS_BNB = True
+except ImportError:
+    HAS_BNB = False
+
 try:
     from qwen_vl_utils import process_vision_info
     HAS_QWEN_VL_UTILS = True
@@ -68,6 +87,26 @@ except ImportError:
         RESET_ALL = DIM = BRIGHT = ""
 
 
+def _inference_mode(func):
+    """Run func under torch.inference_mode(): no autograd metadata or
+    version-counter bookkeeping for any tensor it creates."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not HAS_TORCH:
+            return func(*args, **kwargs)
+        with torch.inference_mode():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _release_memory() -> None:
+    """Collect reference cycles left by an unloaded model and return cached
+    accelerator memory."""
+    gc.collect()
+    if HAS_TORCH and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
 class QwenVisionHandler:
     """
     Qwen2-VL Vision Handler for image understanding.
@@ -86,6 +125,10 @@ class QwenVisionHandler:
     """
 
     DEFAULT_MODEL = "Qwen/Qwen2-VL-2B-Instruct"
+    # Each vision token covers a 28x28 pixel patch (14px patches, 2x2 merge)
+    PIXELS_PER_TOKEN = 28 * 28
+    QUANTIZATION_MODES = {"int4", "int8", "none"}
+    BACKENDS = {"torch", "ipex", "openvino"}
     SUPPORTED_FORMATS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
 
     def __init__(
@@ -96,6 +139,12 @@ class QwenVisionHandler:
         min_image_size: int = 224,
         max_new_tokens: int = 512,
         cache_dir: Optional[str] = None,
+        quantization: str = "none",
+        num_threads: Optional[int] = None,
+        backend: str = "torch",
+        min_pixels: int = 256 * PIXELS_PER_TOKEN,
+        max_pixels: int = 640 * PIXELS_PER_TOKEN,
+        max_memory: Optional[str] = None,
     ):
         """
         Initialize the vision handler.
@@ -107,15 +156,53 @@ class QwenVisionHandler:
             min_image_size: Minimum image dimension (smaller images will be upscaled)
             max_new_tokens: Maximum tokens to generate in response
             cache_dir: Directory to cache downloaded models
+            quantization: Weight-only quantization via bitsandbytes ("int4",
+                          "int8" or "none"). Off by default: bitsandbytes
+                          targets CUDA and is slow or unsupported on CPU.
+                          Ignored when bitsandbytes is not installed;
+                          pre-quantized (AWQ/GPTQ) repos load as-is.
+            num_threads: torch intra-op threads (None = physical core count)
+            backend: Inference runtime: "torch" (transformers), "ipex" (Intel
+                     Extension for PyTorch kernels) or "openvino" (optimum-intel
+                     export). Falls back to "torch" if the package is missing.
+            min_pixels: Lower bound on the pixels the processor feeds the ViT
+                        (256 vision tokens by default)
+            max_pixels: Upper bound on the pixels the processor feeds the ViT
+                        (640 vision tokens by default); bounds prefill cost
+            max_memory: RAM budget for the model weights (e.g. "4GiB"). Layers
+                        that do not fit are offloaded to disk by accelerate and
+                        streamed in per forward pass: slower, but avoids
+                        swapping on low-RAM hosts. None keeps all in RAM.
         """
         self._check_dependencies()
 
+        if quantization not in self.QUANTIZATION_MODES:
+            raise ValueError(
+                f"Unsupported quantization: {quantization}. "
+                f"Supported: {', '.join(sorted(self.QUANTIZATION_MODES))}"
+            )
+
         self.model_id = model_id
         self.device = device
         self.max_image_size = max_image_size
         self.min_image_size = min_image_size
         self.max_new_tokens = max_new_tokens
         self.cache_dir = cache_dir
+        self.quantization = quantization
+        self.num_threads = num_threads or physical_cpu_count()
+        if backend not in self.BACKENDS:
+            raise ValueError(
+                f"Unsupported backend: {backend}. "
+                f"Supported: {', '.join(sorted(self.BACKENDS))}"
+            )
+        self.backend = backend
+        self.min_pixels = min_pixels
+        self.max_pixels = max_pixels
+        self.max_memory = max_memory
+        # BF16 halves weight traffic and uses AMX/AVX512-BF16 where available
+        self.use_bf16 = device == "cpu" and cpu_supports_bf16()
+        if device == "cpu" and not self.use_bf16:
+            logger.info("CPU has no native BF16 support, vision model will use float32")
 
         # Model components (lazy loaded)
         self._model = None
@@ -125,7 +212,31 @@ class QwenVisionHandler:
         # Current state
         self._current_image: Optional[Image.Image] = None
         self._current_image_path: Optional[str] = None
-        self._conversation: List[Dict[str, Any]] = []
+        # Chat messages about the current image (append-only); the first
+        # user message carries the image entry
+        self._messages: List[Dict[str, Any]] = []
+
+        # KV cache of the previous turn and the token ids it covers, so a
+        # follow-up question only prefills its new tokens (and skips the
+        # vision encoder)
+        self._past_kv = None
+        self._cached_ids = None
+
+        # Image processor output (pixel_values, image_grid_thw) for the
+        # current image; identical for every question about it
+        self._image_features: Optional[Dict[str, Any]] = None
+
+        # Incremental tokenization: the chat template split into its fixed
+        # pieces (per processor), the token ids of the template prefix up to
+        # and including the image tokens (per image), and the ids of the
+        # conversation so far, so each turn only tokenizes its new text
+        self._template_parts: Optional[Tuple[str, str, str]] = None
+        self._prefix_ids = None
+        self._prompt_ids = None
+
+        # (path, mtime, size) of the current image: setting the same
+        # unchanged file again keeps all per-image caches
+        self._image_key: Optional[Tuple[str, int, int]] = None
 
     def _check_dependencies(self) -> None:
         """Check if all required dependencies are installed."""
@@ -161,6 +272,21 @@ class QwenVisionHandler:
         """Get the path of the currently loaded image."""
         return self._current_image_path
 
+    def _quantization_config(self) -> Optional["BitsAndBytesConfig"]:
+        """Build the bitsandbytes config for the requested quantization, if any."""
+        if self.quantization == "none":
+            return None
+        if not HAS_BNB:
+            logger.info(f"bitsandbytes not installed, loading {self.model_id} unquantized")
+            return None
+        if self.quantization == "int8":
+            return BitsAndBytesConfig(load_in_8bit=True)
+        return BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.bfloat16 if self.use_bf16 else torch.float32,
+        )
+
     def load_model(self) -> None:
         """
         Load the Qwen2-VL model and processor.
@@ -184,27 +310,46 @@ class QwenVisionHandler:
             # Set up CPU optimizations
             if HAS_TORCH:
                 torch.set_grad_enabled(False)
-                torch.set_num_threads(os.cpu_count() or 4)
+                torch.set_num_threads(self.num_threads)
+                try:
+                    # Inter-op parallelism only adds contention for
+                    # single-request generate(); settable once per process
+                    torch.set_num_interop_threads(1)
+                except RuntimeError:
+                    pass
                 # Explicitly disable CUDA to avoid NVML warning
                 os.environ["CUDA_VISIBLE_DEVICES"] = ""
 
             # Load model with CPU-optimized settings
+            dtype = torch.bfloat16 if self.use_bf16 else torch.float32
             model_kwargs = {
-                "torch_dtype": torch.float32,  # CPU requires float32
-                "device_map": self.device,
+                "torch_dtype": dtype,
+                # On CPU, skip accelerate's device-map dispatch hooks
+                "device_map": None if self.device == "cpu" else self.device,
+                # Materialize weights straight from memory-mapped safetensors
+                # shards (meta-device init, no intermediate state_dict copy)
                 "low_cpu_mem_usage": True,
+                "use_safetensors": True,
+                # Fused scaled_dot_product_attention instead of eager attention
+                "attn_implementation": "sdpa",
             }
 
             if self.cache_dir:
                 model_kwargs["cache_dir"] = self.cache_dir
 
-            self._model = Qwen2VLForConditionalGeneration.from_pretrained(
-                self.model_id,
-                **model_kwargs
-            )
+            if self.backend == "openvino":
+                self._model = self._load_openvino_model()
 
-            # Load processor
-            processor_kwargs = {}
+            if self._model is None:
+                self._model = self._load_torch_model({**model_kwargs, **self._offload_kwargs()})
+                if self.backend == "ipex":
+                    self._model = self._optimize_with_ipex(self._model, dtype)
+
+            # Load processor (pixel bounds cap the number of vision tokens)
+            processor_kwargs = {
+                "min_pixels": self.min_pixels,
+                "max_pixels": self.max_pixels,
+            }
             if self.cache_dir:
                 processor_kwargs["cache_dir"] = self.cache_dir
 
@@ -224,6 +369,76 @@ class QwenVisionHandler:
 
         self._is_loading = False
 
+    def _offload_kwargs(self) -> Dict[str, Any]:
+        """from_pretrained arguments for disk offload under a max_memory budget."""
+        if not self.max_memory:
+            return {}
+        offload_root = self.cache_dir or os.path.join("models", "vision")
+        logger.info(f"Vision model limited to {self.max_memory} RAM, offloading the rest to disk")
+        return {
+            "device_map": "auto",
+            "max_memory": {"cpu": self.max_memory},
+            "offload_folder": os.path.join(offload_root, "offload"),
+        }
+
+    def _load_torch_model(self, model_kwargs: Dict[str, Any]):
+        """Load the transformers model, quantized with bitsandbytes if possible."""
+        quantization_config = self._quantization_config()
+        if quantization_config is not None:
+            try:
+                model = Qwen2VLForConditionalGeneration.from_pretrained(
+                    self.model_id,
+                    quantization_config=quantization_config,
+                    **model_kwargs
+                )
+                logger.info(f"Vision model quantized to {self.quantization}")
+                return model
+            except Exception as e:
+                # bitsandbytes builds without CPU support fail here
+                logger.warning(f"{self.quantization} quantization unavailable ({e}), loading unquantized")
+
+        return Qwen2VLForConditionalGeneration.from_pretrained(
+            self.model_id,
+            **model_kwargs
+        )
+
+    def _load_openvino_model(self):
+        """Export/load the model with OpenVINO, or None if optimum-intel is missing."""
+        try:
+            from optimum.intel import OVModelForVisualCausalLM
+        except ImportError:
+            logger.warning("optimum-intel[openvino] not installed, using torch backend")
+            return None
+
+        ov_kwargs: Dict[str, Any] = {"export": True}
+        if self.quantization == "int8":
+            ov_kwargs["load_in_8bit"] = True
+        elif self.quantization == "int4":
+            ov_kwargs["quantization_config"] = {"bits": 4}
+        if self.cache_dir:
+            ov_kwargs["cache_dir"] = self.cache_dir
+
+        model = OVModelForVisualCausalLM.from_pretrained(self.model_id, **ov_kwargs)
+        logger.info("Vision model running on OpenVINO")
+        return model
+
+    @staticmethod
+    def _optimize_with_ipex(model, dtype):
+        """Apply Intel Extension for PyTorch LLM optimizations if available."""
+        try:
+            import intel_extension_for_pytorch as ipex
+        except ImportError:
+            logger.warning("intel-extension-for-pytorch not installed, using torch backend")
+            return model
+
+        try:
+            model = ipex.llm.optimize(model.eval(), dtype=dtype, inplace=True)
+            logger.info("Vision model optimized with IPEX")
+        except Exception as e:
+            # Not every IPEX release covers every architecture
+            logger.warning(f"IPEX optimization failed ({e}), using torch backend")
+        return model
+
     def _preprocess_image(self, image_path: str) -> Image.Image:
         """
         Load and preprocess an image.
@@ -247,31 +462,48 @@ class QwenVisionHandler:
                 f"Supported formats: {', '.join(self.SUPPORTED_FORMATS)}"
             )
 
-        # Load image
-        image = Image.open(image_path).convert("RGB")
-
-        # Upscale if too small (improves recognition accuracy)
-        # For text recognition, ensure MINIMUM dimension is at least min_image_size
-        # This is critical for images with extreme aspect ratios (e.g., text banners)
-        min_dim = min(image.size)
-        if min_dim < self.min_image_size:
-            scale = self.min_image_size / min_dim
-            new_width = int(image.size[0] * scale)
-            new_height = int(image.size[1] * scale)
-            image = image.resize(
-                (new_width, new_height),
-                Image.Resampling.LANCZOS
-            )
+        # Compute the single target size up front (header only, no decode)
+        with Image.open(image_path) as image:
+            width, height = image.size
+            min_dim = min(width, height)
+            target = None
+
+            # Upscale if too small (improves recognition accuracy)
+            # For text recognition, ensure MINIMUM dimension is at least min_image_size
+            # This is critical for images with extreme aspect ratios (e.g., text banners)
+            if min_dim < self.min_image_size:
+                scale = self.min_image_size / min_dim
+                target = (int(width * scale), int(height * scale))
+
+            # Downscale if too large (improves inference speed)
+            elif max(width, height) > self.max_image_size:
+                scale = self.max_image_size / max(width, height)
+                target = (max(1, round(width * scale)), max(1, round(height * scale)))
+                # Let the JPEG decoder shrink by a power of two while decoding
+                # (no-op for other formats); the result is never below target
+                image.draft("RGB", target)
+
+            # convert() always copies, even RGB -> RGB; decode in place
+            # when the file already is RGB (JPEGs after draft())
+            if image.mode == "RGB":
+                image.load()
+            else:
+                image = image.convert("RGB")
+
+            if target is not None and image.size != target:
+                # reducing_gap pre-shrinks with a cheap box filter before the
+                # LANCZOS pass on large downscales
+                image = image.resize(
+                    target,
+                    Image.Resampling.LANCZOS,
+                    reducing_gap=3.0 if target[0] < image.size[0] else None,
+                )
+
+        if target is not None and min_dim < self.min_image_size:
             logger.info(f"Image upscaled to {image.size} for better recognition (min dimension was {min_dim}px)")
             if _is_interactive:
                 print(f"{Fore.YELLOW}Image upscaled to {image.size} for better recognition{Style.RESET_ALL}")
-
-        # Resize if too large (improves inference speed)
-        elif max(image.size) > self.max_image_size:
-            image.thumbnail(
-                (self.max_image_size, self.max_image_size),
-                Image.Resampling.LANCZOS
-            )
+        elif target is not None:
             logger.info(f"Image resized to {image.size} for faster inference")
             if _is_interactive:
                 print(f"{Fore.YELLOW}Image resized to {image.size} for faster inference{Style.RESET_ALL}")
@@ -293,12 +525,23 @@ class QwenVisionHandler:
             if not self.is_loaded:
                 self.load_model()
 
-            # Preprocess and store image
-            self._current_image = self._preprocess_image(image_path)
-            self._current_image_path = str(Path(image_path).resolve())
+            key = self._image_key_for(image_path)
+            if key is not None and key == self._image_key:
+                # Same unchanged file: keep the decoded image, its features,
+                # prefix ids and the KV cache (the image prefix still matches)
+                logger.debug("Reusing cached image state for %s", image_path)
+            else:
+                # Preprocess and store image
+                self._current_image = self._preprocess_image(image_path)
+                self._current_image_path = str(Path(image_path).resolve())
+                self._image_key = key
+                self._reset_kv_cache()
+                self._image_features = None
+                self._prefix_ids = None
 
             # Clear previous conversation when loading new image
-            self._conversation = []
+            self._messages = []
+            self._prompt_ids = None
 
             return True
 
@@ -308,13 +551,26 @@ class QwenVisionHandler:
                 print(f"{Fore.RED}Failed to load image: {e}{Style.RESET_ALL}")
             return False
 
-    def ask(self, question: str, stream: bool = False) -> str:
+    @staticmethod
+    def _image_key_for(image_path: str) -> Optional[Tuple[str, int, int]]:
+        """Identity of an image file (resolved path, mtime, size), or None if unreadable."""
+        try:
+            path = Path(image_path).resolve()
+            stat = path.stat()
+        except OSError:
+            return None
+        return (str(path), stat.st_mtime_ns, stat.st_size)
+
+    @_inference_mode
+    def ask(self, question: str, stream: bool = False, sampling: bool = False) -> str:
         """
         Ask a question about the current image.
 
         Args:
             question: The question to ask about the image
             stream: Whether to stream the response (not yet implemented)
+            sampling: Sample with temperature/top-p instead of greedy decoding.
+                      Greedy is cheaper per token and deterministic.
 
         Returns:
             The model's response as a string
@@ -325,66 +581,67 @@ class QwenVisionHandler:
         if not self.has_image:
             raise RuntimeError("No image loaded. Call set_image() first.")
 
-        # Build messages with image and question
-        messages = self._build_messages(question)
-
         try:
-            # Prepare inputs
-            text = self._processor.apply_chat_template(
-                messages,
-                tokenize=False,
-                add_generation_prompt=True
-            )
-
-            # Process vision info if available
-            if HAS_QWEN_VL_UTILS:
-                image_inputs, video_inputs = process_vision_info(messages)
+            # Only the new text is tokenized; the prefix (with the image
+            # tokens) and earlier turns are reused as token ids
+            _, turn_open, turn_close = self._get_template_parts()
+            if self._prompt_ids is None:
+                history = self._get_prefix_ids()
+                delta = question + turn_close
             else:
-                image_inputs = [self._current_image]
-                video_inputs = None
+                history = self._prompt_ids
+                delta = turn_open + question + turn_close
+            input_ids = torch.cat([history, self._tokenize(delta)]).unsqueeze(0)
 
-            # Create model inputs
-            inputs = self._processor(
-                text=[text],
-                images=image_inputs,
-                videos=video_inputs,
-                padding=True,
-                return_tensors="pt"
-            )
+            # Create model inputs and move to device
+            inputs = self._to_device(BatchFeature(data={
+                "input_ids": input_ids,
+                "attention_mask": torch.ones_like(input_ids),
+                **self._get_image_features(),
+            }))
 
-            # Move to device
-            inputs = inputs.to(self.device)
+            # Reuse the previous turn's KV cache for the shared prefix
+            past_kv = self._reusable_kv_cache(inputs.input_ids[0])
 
             # Generate response
-            with torch.inference_mode():
-                output_ids = self._model.generate(
+            with torch.autocast(
+                "cpu", dtype=torch.bfloat16, enabled=self.use_bf16
+            ):
+                outputs = self._model.generate(
                     **inputs,
+                    past_key_values=past_kv,
                     max_new_tokens=self.max_new_tokens,
-                    do_sample=True,
-                    temperature=0.7,
-                    top_p=0.8,
+                    return_dict_in_generate=True,
+                    **self._decoding_kwargs(sampling),
                 )
+            output_ids = outputs.sequences
+            # OpenVINO models keep their KV state internally
+            if self.backend != "openvino":
+                self._past_kv = outputs.past_key_values
+                self._cached_ids = output_ids[0]
 
             # Decode response (only the generated part)
-            generated_ids = [
-                output_ids[len(input_ids):]
-                for input_ids, output_ids in zip(inputs.input_ids, output_ids)
-            ]
-
+            generated_ids = output_ids[0][input_ids.shape[1]:].cpu()
             response = self._processor.batch_decode(
-                generated_ids,
+                [generated_ids],
                 skip_special_tokens=True,
                 clean_up_tokenization_spaces=True
             )[0]
 
+            # The generated tokens (minus the trailing end-of-turn token)
+            # become part of the next turn's prompt as-is
+            special_ids = set(self._processor.tokenizer.all_special_ids)
+            answer_len = len(generated_ids)
+            while answer_len and int(generated_ids[answer_len - 1]) in special_ids:
+                answer_len -= 1
+            self._prompt_ids = torch.cat([input_ids[0], generated_ids[:answer_len]])
+
             # Store in conversation history
-            self._conversation.append({
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": question}
-                ]
-            })
-            self._conversation.append({
+            content = [{"type": "text", "text": question}]
+            if not self._messages:
+                content.insert(0, self._image_entry())
+            self._messages.append({"role": "user", "content": content})
+            self._messages.append({
                 "role": "assistant",
                 "content": response
             })
@@ -392,89 +649,223 @@ class QwenVisionHandler:
             return response.strip()
 
         except Exception as e:
+            self._reset_kv_cache()
             raise RuntimeError(f"Failed to generate response: {e}")
 
-    def _build_messages(self, question: str) -> List[Dict[str, Any]]:
+    def _to_device(self, inputs: BatchFeature) -> BatchFeature:
+        """Move model inputs to the model's device (they are built on CPU)."""
+        if self.device == "cpu":
+            return inputs
+        return inputs.to(self.device)
+
+    def _decoding_kwargs(self, sampling: bool) -> Dict[str, Any]:
+        """Generation arguments for sampled or greedy decoding."""
+        if sampling:
+            return {"do_sample": True, "temperature": 0.7, "top_p": 0.8}
+        return {"do_sample": False, "num_beams": 1}
+
+    def _get_image_features(self) -> Dict[str, Any]:
         """
-        Build the message list for the model.
+        Get the image processor output for the current image, computing it
+        on the first question and reusing it for follow-ups.
+
+        Returns:
+            Dict with pixel_values and image_grid_thw tensors
+        """
+        if self._image_features is None:
+            if HAS_QWEN_VL_UTILS:
+                image_inputs, _ = process_vision_info([
+                    {"role": "user", "content": [self._image_entry()]}
+                ])
+            else:
+                image_inputs = [self._current_image]
+            self._image_features = dict(self._processor.image_processor(
+                images=image_inputs,
+                return_tensors="pt"
+            ))
+        return self._image_features
+
+    def _image_entry(self) -> Dict[str, Any]:
+        """Message content entry for the current image."""
+        return {
+            "type": "image",
+            "image": self._current_image_path,
+            "min_pixels": self.min_pixels,
+            "max_pixels": self.max_pixels,
+        }
+
+    def _get_template_parts(self) -> Tuple[str, str, str]:
+        """
+        Split the chat template into the fixed text around user questions.
+
+        The template is rendered once with placeholder texts and cut at
+        them, so a conversation can be tokenized one turn at a time.
+
+        Returns:
+            Tuple of (prefix, turn_open, turn_close): the text before the
+            first question (ending with the image placeholder), the text
+            between an answer and the next question, and the text between
+            a question and the answer.
+        """
+        if self._template_parts is None:
+            first, answer, second = "<<Q1>>", "<<A1>>", "<<Q2>>"
+            text = self._processor.apply_chat_template(
+                [
+                    {"role": "user", "content": [
+                        self._image_entry(),
+                        {"type": "text", "text": first},
+                    ]},
+                    {"role": "assistant", "content": answer},
+                    {"role": "user", "content": [{"type": "text", "text": second}]},
+                ],
+                tokenize=False,
+                add_generation_prompt=True
+            )
+            prefix, rest = text.split(first)
+            rest = rest.split(answer)[1]
+            turn_open, turn_close = rest.split(second)
+            self._template_parts = (prefix, turn_open, turn_close)
+        return self._template_parts
+
+    def _get_prefix_ids(self):
+        """
+        Get the token ids of the template prefix for the current image,
+        with the image placeholder expanded to the number of vision tokens
+        the processor would insert.
+        """
+        if self._prefix_ids is None:
+            prefix = self._get_template_parts()[0]
+            features = self._get_image_features()
+            image_token = getattr(self._processor, "image_token", "<|image_pad|>")
+            merge_length = self._processor.image_processor.merge_size ** 2
+            num_image_tokens = int(features["image_grid_thw"][0].prod()) // merge_length
+            prefix = prefix.replace(image_token, image_token * num_image_tokens, 1)
+            self._prefix_ids = self._tokenize(prefix)
+        return self._prefix_ids
+
+    def _tokenize(self, text: str):
+        """Tokenize text into a 1-D tensor of ids (no special tokens added)."""
+        return self._processor.tokenizer(text, return_tensors="pt").input_ids[0]
+
+    def _reusable_kv_cache(self, input_ids):
+        """
+        Get the previous turn's KV cache, trimmed to the prefix it shares
+        with input_ids, or None if nothing can be reused.
+
+        The prompt normally extends the cached ids exactly (the previous
+        answer is reused as generated tokens), but the cache is cropped to
+        the longest common prefix in case it does not. At least one token is
+        always left uncached for generate() to process.
+        """
+        if self._past_kv is None or self._cached_ids is None:
+            return None
+
+        cached = self._cached_ids
+        limit = min(len(cached), len(input_ids) - 1)
+        mismatch = (cached[:limit] != input_ids[:limit]).nonzero()
+        common = int(mismatch[0]) if len(mismatch) else limit
+
+        if common == 0 or not hasattr(self._past_kv, "crop"):
+            self._reset_kv_cache()
+            return None
+
+        self._past_kv.crop(common)
+        logger.debug("Reusing KV cache for %d/%d prompt tokens", common, len(input_ids))
+        return self._past_kv
+
+    def _reset_kv_cache(self) -> None:
+        """Drop the cached KV state (new image, cleared history or error)."""
+        self._past_kv = None
+        self._cached_ids = None
+
+    @_inference_mode
+    def ask_batch(self, questions: List[str]) -> List[str]:
+        """
+        Ask several independent questions about the current image in one
+        batched generation.
+
+        Each question is appended to the current conversation as its own
+        (left-padded) row, so the decoder runs the rows in lockstep with
+        larger, more efficient matrix multiplies. The answers are not added
+        to the conversation history.
 
         Args:
-            question: The current question
+            questions: Questions to ask about the image
 
         Returns:
-            List of message dictionaries
+            One answer per question, in order
         """
-        messages = []
-
-        # First message includes the image
-        if not self._conversation:
-            # First question about this image
-            messages.append({
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "image": self._current_image_path,
-                    },
-                    {
-                        "type": "text",
-                        "text": question
-                    }
-                ]
-            })
-        else:
-            # Follow-up questions - include conversation history
-            # First message with image
-            messages.append({
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "image": self._current_image_path,
-                    },
-                    {
-                        "type": "text",
-                        "text": self._conversation[0]["content"][0]["text"]
-                        if isinstance(self._conversation[0]["content"], list)
-                        else self._conversation[0]["content"]
-                    }
-                ]
-            })
+        if len(questions) == 1:
+            return [self.ask(questions[0])]
 
-            # Add rest of conversation history
-            for msg in self._conversation[1:]:
-                if msg["role"] == "assistant":
-                    messages.append({
-                        "role": "assistant",
-                        "content": msg["content"]
-                    })
-                else:
-                    messages.append({
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": msg["content"][0]["text"]
-                             if isinstance(msg["content"], list) else msg["content"]}
-                        ]
-                    })
-
-            # Add current question
-            messages.append({
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": question}
-                ]
-            })
+        if not self.is_loaded:
+            raise RuntimeError("Model not loaded. Call load_model() first.")
+
+        if not self.has_image:
+            raise RuntimeError("No image loaded. Call set_image() first.")
+
+        try:
+            _, turn_open, turn_close = self._get_template_parts()
+            if self._prompt_ids is None:
+                history, opener = self._get_prefix_ids(), ""
+            else:
+                history, opener = self._prompt_ids, turn_open
+            rows = [
+                torch.cat([history, self._tokenize(opener + q + turn_close)])
+                for q in questions
+            ]
 
-        return messages
+            width = max(len(row) for row in rows)
+            input_ids = torch.full(
+                (len(rows), width), self._processor.tokenizer.pad_token_id, dtype=torch.long
+            )
+            attention_mask = torch.zeros_like(input_ids)
+            for i, row in enumerate(rows):
+                input_ids[i, width - len(row):] = row
+                attention_mask[i, width - len(row):] = 1
+
+            # Every row holds one copy of the image
+            features = self._get_image_features()
+            inputs = self._to_device(BatchFeature(data={
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "pixel_values": features["pixel_values"].repeat(len(rows), 1),
+                "image_grid_thw": features["image_grid_thw"].repeat(len(rows), 1),
+            }))
+
+            # Assisted (speculative) generation only supports batch size 1
+            decoding = self._decoding_kwargs(sampling=False)
+            decoding.pop("assistant_model", None)
+
+            with torch.autocast(
+                "cpu", dtype=torch.bfloat16, enabled=self.use_bf16
+            ):
+                output_ids = self._model.generate(
+                    **inputs,
+                    max_new_tokens=self.max_new_tokens,
+                    **decoding,
+                )
+
+            answers = self._processor.batch_decode(
+                output_ids[:, width:],
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=True
+            )
+            return [answer.strip() for answer in answers]
+
+        except Exception as e:
+            raise RuntimeError(f"Failed to generate response: {e}")
 
     def clear(self) -> None:
         """Clear the current image and conversation history."""
         self._current_image = None
         self._current_image_path = None
-        self._conversation = []
-
-        # Force garbage collection
-        gc.collect()
+        self._image_key = None
+        self._messages = []
+        self._reset_kv_cache()
+        self._image_features = None
+        self._prefix_ids = None
+        self._prompt_ids = None
 
     def unload(self) -> None:
         """
@@ -490,14 +881,14 @@ class QwenVisionHandler:
         if self._processor is not None:
             del self._processor
             self._processor = None
+            self._template_parts = None
 
         self.clear()
 
-        # Force garbage collection
-        gc.collect()
-
-        if HAS_TORCH and torch.cuda.is_available():
-            torch.cuda.empty_cache()
+        # Tensors are freed by refcounting as soon as the references above
+        # are dropped; a full collection (only needed for reference cycles)
+        # walks the whole heap, so keep it off the caller's thread
+        threading.Thread(target=_release_memory, name="vision-gc", daemon=True).start()
 
         logger.info("Vision model unloaded")
         if _is_interactive:
@@ -508,9 +899,10 @@ class QwenVisionHandler:
         Get the current conversation history.
 
         Returns:
-            List of conversation messages
+            List of conversation messages (the first user message includes
+            the image entry)
         """
-        return self._conversation.copy()
+        return self._messages.copy()
 
 
 # =============================================================================
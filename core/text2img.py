@@ -9,27 +9,35 @@ Author: Generated with love by Harei-chan (￣▽￣)ノ
 
 import os
 import gc
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Callable, Any
+from typing import Optional, Callable, Any, Tuple
 
 # Try to import config (will set environment variables automatically)
 # If running as standalone script, use fallback defaults
 try:
-    from core.config import settings  # noqa: F401
+    from core.config import settings, cpu_supports_bf16, cpu_supports_fp16  # noqa: F401
 except ImportError:
     # Standalone script mode: set environment variables with defaults
     os.environ.setdefault("DIFFUSERS_VERBOSITY", "error")
     os.environ.setdefault("TRANSFORMERS_VERBOSITY", "error")
     os.environ.setdefault("TQDM_DISABLE", "1")
 
+    def cpu_supports_bf16() -> bool:
+        return False
+
+    def cpu_supports_fp16() -> bool:
+        return False
+
 try:
     import torch
     # Explicitly disable CUDA to avoid NVML warning
     import os
     os.environ["CUDA_VISIBLE_DEVICES"] = ""
     from diffusers import DiffusionPipeline, LCMScheduler
+    from diffusers.models.attention_processor import AttnProcessor2_0
     from diffusers.utils import logging as diffusers_logging
     from PIL import Image
     HAS_DIFFUSERS = True
@@ -42,6 +50,14 @@ except ImportError:
     Image = None
 
 
+def _release_memory() -> None:
+    """Collect reference cycles left by an unloaded pipeline and return
+    cached accelerator memory."""
+    gc.collect()
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
 class Text2ImageGenerator:
     """
     LCM-SD1.5 based text-to-image generator optimized for CPU.
@@ -61,6 +77,7 @@ class Text2ImageGenerator:
     DEFAULT_MODEL = "SimianLuo/LCM_Dreamshaper_v7"
     DEFAULT_STEPS = 6
     DEFAULT_GUIDANCE = 1.5
+    BACKENDS = {"torch", "ipex", "openvino"}
 
     def __init__(
         self,
@@ -69,6 +86,10 @@ class Text2ImageGenerator:
         guidance_scale: float = DEFAULT_GUIDANCE,
         cache_dir: str = "./models/diffusion",
         enable_attention_slicing: bool = True,
+        backend: str = "torch",
+        compile_model: bool = True,
+        static_shape: Tuple[int, int] = (512, 512),
+        low_memory: bool = False,
     ):
         """
         Initialize the text-to-image generator.
@@ -79,6 +100,18 @@ class Text2ImageGenerator:
             guidance_scale: Classifier-free guidance scale (1.0-2.0 for LCM)
             cache_dir: Directory to cache downloaded models
             enable_attention_slicing: Enable attention slicing to reduce memory usage
+                                      (only used when fused SDPA attention is unavailable)
+            backend: Inference runtime: "torch" (diffusers), "ipex" (Intel
+                     Extension for PyTorch kernels for the UNet) or "openvino"
+                     (optimum-intel export). Falls back to "torch" if the
+                     package is missing.
+            compile_model: Compile the UNet and VAE decoder with torch.compile
+                           (Inductor) for fused CPU kernels ("torch" backend only)
+            static_shape: (width, height) the compiled graphs are specialized
+                          for and warmed up with at load time; other sizes
+                          run the eager modules instead of recompiling
+            low_memory: Trade speed for peak RAM on memory-bound hosts: sliced
+                        attention and sliced/tiled VAE decoding
         """
         if not HAS_DIFFUSERS:
             raise ImportError(
@@ -91,9 +124,29 @@ class Text2ImageGenerator:
         self.guidance_scale = guidance_scale
         self.cache_dir = cache_dir
         self.enable_attention_slicing = enable_attention_slicing
+        if backend not in self.BACKENDS:
+            raise ValueError(
+                f"Unsupported backend: {backend}. "
+                f"Supported: {', '.join(sorted(self.BACKENDS))}"
+            )
+        self.backend = backend
+        self.compile_model = compile_model
+        self.static_shape = tuple(static_shape)
+        self.low_memory = low_memory
+        # BF16 halves weight traffic and uses AMX/AVX512-BF16 where available
+        self.use_bf16 = cpu_supports_bf16()
+        # Without BF16, the VAE (large feature maps, no feedback loop) can
+        # still run in FP16 on CPUs with native FP16 matmuls
+        self.vae_fp16 = not self.use_bf16 and cpu_supports_fp16()
 
         self._pipeline = None
         self._is_loading = False
+        # (unet, vae decoder) pairs: eager originals and compiled versions
+        self._eager_modules = None
+        self._compiled_modules = None
+        # Held for a whole generation: the (unet, vae decoder) pair installed
+        # by _select_modules must stay in place until the run finishes
+        self._run_lock = threading.Lock()
 
     @property
     def is_loaded(self) -> bool:
@@ -126,25 +179,56 @@ class Text2ImageGenerator:
             os.makedirs(self.cache_dir, exist_ok=True)
 
             # Load the pipeline
-            self._pipeline = DiffusionPipeline.from_pretrained(
-                self.model_id,
-                torch_dtype=torch.float32,  # CPU requires float32
-                cache_dir=self.cache_dir,
-                safety_checker=None,  # Disable safety checker for faster inference
-            )
+            if self.backend == "openvino":
+                self._pipeline = self._load_openvino_pipeline()
+
+            if self._pipeline is None:
+                self._pipeline = DiffusionPipeline.from_pretrained(
+                    self.model_id,
+                    torch_dtype=torch.bfloat16 if self.use_bf16 else torch.float32,
+                    cache_dir=self.cache_dir,
+                    safety_checker=None,  # Disable safety checker for faster inference
+                    # Memory-mapped safetensors with meta-device init: no
+                    # full read + copy of each checkpoint before loading
+                    use_safetensors=True,
+                    low_cpu_mem_usage=True,
+                )
+                if self.backend == "ipex":
+                    self._optimize_with_ipex()
 
             # Configure LCM scheduler for fast inference
             self._pipeline.scheduler = LCMScheduler.from_config(
                 self._pipeline.scheduler.config
             )
 
-            # Memory optimization for CPU
-            if self.enable_attention_slicing:
-                self._pipeline.enable_attention_slicing(slice_size="auto")
+            # Fused scaled_dot_product_attention (PyTorch 2) is both faster and
+            # leaner than eager attention; slicing would replace it, so it is
+            # only the fallback memory optimization (torch pipelines only)
+            if isinstance(self._pipeline, DiffusionPipeline):
+                if self.low_memory:
+                    # One attention slice and one VAE tile/image at a time
+                    self._pipeline.enable_attention_slicing(slice_size="auto")
+                    self._pipeline.enable_vae_slicing()
+                    self._pipeline.enable_vae_tiling()
+                elif hasattr(torch.nn.functional, "scaled_dot_product_attention"):
+                    self._pipeline.unet.set_attn_processor(AttnProcessor2_0())
+                elif self.enable_attention_slicing:
+                    self._pipeline.enable_attention_slicing(slice_size="auto")
 
             # Move to CPU explicitly
             self._pipeline.to("cpu")
 
+            if self.vae_fp16 and isinstance(self._pipeline, DiffusionPipeline):
+                self._pipeline.vae.to(torch.float16)
+                print("Image decoder (VAE) running in float16")
+            else:
+                self.vae_fp16 = False
+
+            if self.compile_model and self.backend == "torch" and hasattr(torch, "compile"):
+                self._compile_pipeline()
+
+            if not self.use_bf16:
+                print("CPU has no native BF16 support, using float32")
             print("Image generation model loaded successfully!")
 
         except Exception as e:
@@ -153,6 +237,82 @@ class Text2ImageGenerator:
 
         self._is_loading = False
 
+    def _compile_pipeline(self) -> None:
+        """
+        Compile the UNet and VAE decoder with Inductor for static_shape and
+        warm them up.
+
+        The UNet runs once per denoising step, so fused kernels pay off on
+        every image; the warm-up run moves the compile cost into loading.
+        Falls back to eager mode if compilation fails.
+        """
+        unet, decoder = self._pipeline.unet, self._pipeline.vae.decoder
+        width, height = self.static_shape
+        print(f"Compiling image generation model for {width}x{height} (one-time)...")
+        try:
+            self._use_modules((
+                torch.compile(unet, backend="inductor", dynamic=False),
+                torch.compile(decoder, backend="inductor", dynamic=False),
+            ))
+            self._run_pipeline(
+                prompt="warmup",
+                width=width,
+                height=height,
+                num_inference_steps=1,
+                guidance_scale=self.guidance_scale,
+            )
+        except Exception as e:
+            print(f"torch.compile unavailable ({e}), using eager mode")
+            self._use_modules((unet, decoder))
+            return
+
+        self._eager_modules = (unet, decoder)
+        self._compiled_modules = (self._pipeline.unet, self._pipeline.vae.decoder)
+
+    def _use_modules(self, modules) -> None:
+        """Install a (unet, vae decoder) pair into the pipeline."""
+        self._pipeline.unet, self._pipeline.vae.decoder = modules
+
+    def _select_modules(self, width: int, height: int) -> None:
+        """
+        Use the compiled modules for static_shape and the eager ones for
+        any other size, so odd sizes never trigger a recompilation.
+        """
+        if self._compiled_modules is None:
+            return
+        if (width, height) == self.static_shape:
+            self._use_modules(self._compiled_modules)
+        else:
+            self._use_modules(self._eager_modules)
+
+    def _load_openvino_pipeline(self):
+        """Export/load the pipeline with OpenVINO, or None if optimum-intel is missing."""
+        try:
+            from optimum.intel import OVStableDiffusionPipeline
+        except ImportError:
+            print("optimum-intel[openvino] not installed, using torch backend")
+            return None
+
+        pipeline = OVStableDiffusionPipeline.from_pretrained(
+            self.model_id,
+            export=True,
+            cache_dir=self.cache_dir,
+        )
+        print("Image generation running on OpenVINO")
+        return pipeline
+
+    def _optimize_with_ipex(self) -> None:
+        """Apply Intel Extension for PyTorch optimizations to the UNet if available."""
+        try:
+            import intel_extension_for_pytorch as ipex
+        except ImportError:
+            print("intel-extension-for-pytorch not installed, using torch backend")
+            return
+
+        dtype = torch.bfloat16 if self.use_bf16 else torch.float32
+        self._pipeline.unet = ipex.optimize(self._pipeline.unet.eval(), dtype=dtype, inplace=True)
+        print("Image generation UNet optimized with IPEX")
+
     def generate(
         self,
         prompt: str,
@@ -183,12 +343,10 @@ class Text2ImageGenerator:
         self._load_pipeline()
 
         # Set up random generator for reproducibility
-        if seed is not None:
-            generator = torch.Generator(device="cpu").manual_seed(seed)
-        else:
+        if seed is None:
             # Use current timestamp as seed for variety
             seed = int(time.time() * 1000) % (2**32)
-            generator = torch.Generator(device="cpu").manual_seed(seed)
+        generator = torch.Generator(device="cpu").manual_seed(seed)
 
         # Callback wrapper to match diffusers API
         def callback_wrapper(pipe, step, timestep, callback_kwargs):
@@ -196,19 +354,62 @@ class Text2ImageGenerator:
                 progress_callback(step, self.num_inference_steps, callback_kwargs.get("latents"))
             return callback_kwargs
 
-        # Generate image
-        result = self._pipeline(
-            prompt=prompt,
-            negative_prompt=negative_prompt if negative_prompt else None,
-            width=width,
-            height=height,
-            num_inference_steps=self.num_inference_steps,
-            guidance_scale=self.guidance_scale,
-            generator=generator,
-            callback_on_step_end=callback_wrapper if progress_callback else None,
-        )
+        # Generate image (one at a time: the pipeline is shared, and torch
+        # already spreads a single run over all cores)
+        with self._run_lock:
+            self._select_modules(width, height)
+            return self._run_pipeline(
+                prompt=prompt,
+                negative_prompt=negative_prompt if negative_prompt else None,
+                width=width,
+                height=height,
+                num_inference_steps=self.num_inference_steps,
+                guidance_scale=self.guidance_scale,
+                generator=generator,
+                # OpenVINO pipelines don't take step callbacks
+                callback_on_step_end=(
+                    callback_wrapper
+                    if progress_callback and isinstance(self._pipeline, DiffusionPipeline)
+                    else None
+                ),
+            )
+
+    def _run_pipeline(self, **kwargs) -> "Image.Image":
+        """
+        Run the pipeline and return the first image.
+
+        With an FP16 VAE the pipeline stops at the latents, which are then
+        decoded separately at the VAE's precision.
+        """
+        # inference_mode (stricter and cheaper than the pipeline's own
+        # no_grad) for the whole run, the compile warm-up included, so the
+        # compiled graphs are traced under the same grad mode they run in
+        with torch.inference_mode():
+            with torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.use_bf16):
+                if not self.vae_fp16:
+                    return self._pipeline(**kwargs).images[0]
+                latents = self._pipeline(output_type="latent", **kwargs).images
+
+            image = self.decode_latents(latents)
+            return self._pipeline.image_processor.postprocess(image, output_type="pil")[0]
+
+    def decode_latents(self, latents: "torch.Tensor") -> "torch.Tensor":
+        """
+        Decode UNet latents with the VAE, whatever precision it runs in.
 
-        return result.images[0]
+        Used for the final image and for step previews; the latents are
+        cast to the VAE's dtype (float16 with vae_fp16) first.
+
+        Returns:
+            float32 image tensor in [-1, 1], shaped (batch, 3, height, width)
+        """
+        vae = self._pipeline.vae
+        with torch.inference_mode():
+            image = vae.decode(
+                latents.to(vae.dtype) / vae.config.scaling_factor,
+                return_dict=False,
+            )[0]
+        return image.float()
 
     def generate_and_save(
         self,
@@ -255,12 +456,12 @@ class Text2ImageGenerator:
         if self._pipeline is not None:
             del self._pipeline
             self._pipeline = None
+            self._eager_modules = None
+            self._compiled_modules = None
 
-            # Force garbage collection
-            gc.collect()
-
-            if torch is not None and torch.cuda.is_available():
-                torch.cuda.empty_cache()
+            # Tensors are freed by refcounting; the full collection (for
+            # reference cycles) walks the whole heap, so run it off-thread
+            threading.Thread(target=_release_memory, name="text2img-gc", daemon=True).start()
 
 
 # Convenience function for quick generation
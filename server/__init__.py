@@ -10,6 +10,7 @@ Modules:
 - routers: API route handlers (chat, vision, image)
 - services: Business logic services
 - models: Pydantic request/response schemas
+- utils: Shared helpers (SSE event batching)
 
 Author: Generated with love by Harei-chan
 """
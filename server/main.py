@@ -10,10 +10,13 @@ Usage:
     uvicorn api.main:app --reload --host 0.0.0.0 --port 8000
 """
 
+import asyncio
+import functools
 import os
 import sys
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Optional
 
 # Explicitly disable CUDA before any torch imports to avoid NVML warnings
 # This must be set before importing any libraries that use PyTorch
@@ -22,17 +25,30 @@ os.environ["CUDA_VISIBLE_DEVICES"] = ""
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+
+try:
+    # Optional: several times faster JSON encoding (pip install orjson)
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as AppJSONResponse
+except ImportError:
+    AppJSONResponse = JSONResponse
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import logging
+import logging.handlers
+import queue
+import time
 
 from core.config import settings
 from core.log_listener import get_log_listener, LogLevel, LogRecord, create_log_forwarder
 from server.routers import chat, vision, image, multimodal
 from server.models.schemas import HealthResponse, ErrorResponse
+from server.services.chat_service import chat_service
+from server.services.vision_service import vision_service
+from server.services.image_service import image_service
 
 
 # =============================================================================
@@ -41,14 +57,64 @@ from server.models.schemas import HealthResponse, ErrorResponse
 
 # Create application-specific logger for intercepted logs
 app_logger = logging.getLogger("qwen.server")
-app_logger.setLevel(logging.DEBUG)
+# DEBUG records (watchfiles emits many while watching for reloads) are
+# dropped by the forwarder before formatting unless debugging
+app_logger.setLevel(logging.DEBUG if settings.debug else logging.INFO)
+
+class _FastFormatter(logging.Formatter):
+    """
+    Formats records as '%(asctime)s - %(name)s - %(levelname)s - %(message)s'.
+
+    The strftime() part of the timestamp only changes once per second, so
+    it is cached and the line is built with a single f-string instead of
+    %-interpolating a record dict per record.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._last_second: Optional[int] = None
+        self._last_stamp = ""
+
+    def format(self, record: logging.LogRecord) -> str:
+        second = int(record.created)
+        if second != self._last_second:
+            self._last_stamp = time.strftime("%Y-%m-%d %H:%M:%S", self.converter(second))
+            self._last_second = second
+        line = (
+            f"{self._last_stamp},{int(record.msecs):03d} - {record.name} - "
+            f"{record.levelname} - {record.getMessage()}"
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line = f"{line}\n{record.exc_text}"
+        if record.stack_info:
+            line = f"{line}\n{self.formatStack(record.stack_info)}"
+        return line
+
 
 # Configure output format
 _app_handler = logging.StreamHandler()
-_app_handler.setFormatter(logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-))
-app_logger.addHandler(_app_handler)
+_app_handler.setFormatter(_FastFormatter())
+
+# Log calls on the event loop only enqueue the record; a background
+# thread does the (blocking) stderr writes
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_queue_listener = logging.handlers.QueueListener(
+    _log_queue, _app_handler, respect_handler_level=True
+)
+
+
+def _start_log_queue() -> None:
+    """Start the queue listener thread unless it is already running."""
+    if _queue_listener._thread is None:
+        _queue_listener.start()
+
+
+# Started now for early startup logs; a later lifespan restarts it after
+# the previous one's shutdown stopped it
+_start_log_queue()
+app_logger.addHandler(logging.handlers.QueueHandler(_log_queue))
 app_logger.propagate = False  # Prevent duplicate output
 
 # Initialize log listener immediately at module load time
@@ -80,6 +146,8 @@ def on_server_error(record: LogRecord) -> None:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager for startup and shutdown events."""
+    _start_log_queue()
+
     # Register additional callbacks (listener already started at module level)
     _listener.on_keyword("reload", on_server_reload) \
              .on_keyword("shutdown", on_server_reload) \
@@ -87,13 +155,14 @@ async def lifespan(app: FastAPI):
 
     # Startup
     app_logger.info(f"Starting {settings.app_name} v{settings.app_version}")
-    settings.ensure_directories()
     app_logger.info(f"Upload directory: {settings.upload_dir}")
     app_logger.info(f"Output directory: {settings.output_dir}")
+    app_logger.info(f"Event loop: {type(asyncio.get_running_loop()).__module__}")
     yield
     # Shutdown
     _listener.stop()
     app_logger.info("Shutting down API server...")
+    _queue_listener.stop()  # Flushes queued records
 
 
 # Create FastAPI application
@@ -102,6 +171,7 @@ app = FastAPI(
     description="AI Chat API with Text, Vision, and Image Generation capabilities",
     version=settings.app_version,
     lifespan=lifespan,
+    default_response_class=AppJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
 )
@@ -111,13 +181,17 @@ app = FastAPI(
 # Middleware
 # =============================================================================
 
-# CORS middleware for frontend access
+# CORS middleware for frontend access. Explicit allow-lists (instead of
+# "*", which makes Starlette echo each preflight's requested headers) and
+# a max_age so browsers cache preflights for 10 minutes.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
+    allow_headers=["accept", "content-type", "authorization", "x-requested-with"],
+    expose_headers=["x-accel-buffering"],
+    max_age=600,
 )
 
 
@@ -125,15 +199,22 @@ app.add_middleware(
 # Exception Handlers
 # =============================================================================
 
+@functools.lru_cache(maxsize=128)
+def _error_body(error: str, detail: Optional[str]) -> bytes:
+    """Serialized ErrorResponse (outside debug mode there is only one)."""
+    return AppJSONResponse(ErrorResponse(error=error, detail=detail).model_dump()).body
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler for unhandled errors."""
-    return JSONResponse(
+    return Response(
         status_code=500,
-        content=ErrorResponse(
-            error="Internal server error",
-            detail=str(exc) if settings.debug else None
-        ).model_dump()
+        content=_error_body(
+            "Internal server error",
+            str(exc) if settings.debug else None
+        ),
+        media_type="application/json"
     )
 
 
@@ -141,89 +222,117 @@ async def global_exception_handler(request: Request, exc: Exception):
 # Routes
 # =============================================================================
 
-# Include API routers
-app.include_router(
-    chat.router,
-    prefix="/api/chat",
-    tags=["Chat"]
-)
+# Include API routers (prefix and tags are set on each router)
+app.include_router(chat.router)
+app.include_router(vision.router)
+app.include_router(image.router)
+app.include_router(multimodal.router)
 
-app.include_router(
-    vision.router,
-    prefix="/api/vision",
-    tags=["Vision"]
-)
 
-app.include_router(
-    image.router,
-    prefix="/api/image",
-    tags=["Image Generation"]
-)
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles for files that are never rewritten under the same name.
 
-app.include_router(
-    multimodal.router,
-    prefix="/api",
-    tags=["Multimodal Chat"]
-)
+    Starlette already streams files in chunks (or via the ASGI pathsend
+    extension) and answers conditional requests from ETag/Last-Modified
+    with 304; this adds a long-lived Cache-Control so browsers skip even
+    the revalidation round trip.
+    """
 
+    CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-# Static file serving for generated images and uploads
-if os.path.exists(settings.output_dir):
-    app.mount(
-        "/outputs",
-        StaticFiles(directory=settings.output_dir),
-        name="outputs"
-    )
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("cache-control", self.CACHE_CONTROL)
+        return response
 
-if os.path.exists(settings.upload_dir):
-    app.mount(
-        "/uploads",
-        StaticFiles(directory=settings.upload_dir),
-        name="uploads"
-    )
+
+# Static file serving for generated images (gen_<timestamp>_<seed>.png) and
+# uploads (<uuid>.<ext>). The directories are created first so the mounts
+# exist even on a fresh deploy.
+settings.ensure_directories()
+
+app.mount(
+    "/outputs",
+    ImmutableStaticFiles(directory=settings.output_dir),
+    name="outputs"
+)
+
+app.mount(
+    "/uploads",
+    ImmutableStaticFiles(directory=settings.upload_dir),
+    name="uploads"
+)
 
 
 # =============================================================================
 # Root Endpoints
 # =============================================================================
 
+# Root payload never changes: serialized once
+_ROOT_BODY = AppJSONResponse({
+    "name": settings.app_name,
+    "version": settings.app_version,
+    "docs": "/docs",
+    "endpoints": {
+        "chat": "/api/chat",
+        "vision": "/api/vision",
+        "image": "/api/image",
+        "multimodal": "/api/multimodal",
+    }
+}).body
+
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint with API information."""
-    return {
-        "name": settings.app_name,
-        "version": settings.app_version,
-        "docs": "/docs",
-        "endpoints": {
-            "chat": "/api/chat",
-            "vision": "/api/vision",
-            "image": "/api/image",
-            "multimodal": "/api/multimodal",
+    return Response(content=_ROOT_BODY, media_type="application/json")
+
+
+# Static part of the health payload, validated once; only the loaded
+# flags change between probes
+_HEALTH_TEMPLATE = HealthResponse(
+    status="healthy",
+    version=settings.app_version,
+    models={
+        "chat": {
+            "model_id": settings.chat_model_id,
+            "filename": settings.chat_model_filename,
+        },
+        "vision": {
+            "model_id": settings.vision_model_id,
+        },
+        "image": {
+            "model_id": settings.image_model_id,
         }
     }
+).model_dump()
+
+
+@functools.lru_cache(maxsize=8)
+def _health_body(chat_loaded: bool, vision_loaded: bool, image_loaded: bool) -> bytes:
+    """Serialized health payload (one per combination of loaded flags)."""
+    models = _HEALTH_TEMPLATE["models"]
+    return AppJSONResponse({
+        **_HEALTH_TEMPLATE,
+        "models": {
+            "chat": {**models["chat"], "loaded": chat_loaded},
+            "vision": {**models["vision"], "loaded": vision_loaded},
+            "image": {**models["image"], "loaded": image_loaded},
+        }
+    }).body
 
 
 @app.get("/health", response_model=HealthResponse, tags=["Root"])
 async def health_check():
     """Health check endpoint."""
-    return HealthResponse(
-        status="healthy",
-        version=settings.app_version,
-        models={
-            "chat": {
-                "model_id": settings.chat_model_id,
-                "filename": settings.chat_model_filename,
-                "loaded": False  # Will be updated by service
-            },
-            "vision": {
-                "model_id": settings.vision_model_id,
-                "loaded": False
-            },
-            "image": {
-                "model_id": settings.image_model_id,
-                "loaded": False
-            }
-        }
+    return Response(
+        content=_health_body(
+            chat_service.is_loaded,
+            vision_service.is_loaded,
+            image_service.is_loaded,
+        ),
+        media_type="application/json"
     )
 
 
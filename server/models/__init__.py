@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""Server Models Package"""
+"""Server Models Package
 
-from server.models.schemas import (
-    ChatRequest,
-    ChatResponse,
-    VisionUploadResponse,
-    VisionAskRequest,
-    ImageGenerateRequest,
-)
+Schemas are imported on first attribute access (PEP 562).
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from server.models.schemas import (
+        ChatRequest,
+        ChatResponse,
+        VisionUploadResponse,
+        VisionAskRequest,
+        ImageGenerateRequest,
+    )
 
 __all__ = [
     "ChatRequest",
@@ -17,3 +24,12 @@ __all__ = [
     "VisionAskRequest",
     "ImageGenerateRequest",
 ]
+
+
+def __getattr__(name: str):
+    """Import the schemas module on first access."""
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module("server.models.schemas"), name)
+    globals()[name] = value  # Cache so __getattr__ is not hit again
+    return value
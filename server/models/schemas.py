@@ -7,8 +7,49 @@ Data validation and serialization schemas.
 Author: Generated with love by Harei-chan
 """
 
-from typing import Optional, List, Literal
-from pydantic import BaseModel, Field
+from typing import Any, Awaitable, Callable, Dict, Optional, List, Literal, Type, TypeVar
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field, ValidationError
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+# =============================================================================
+# Request Body Parsing
+# =============================================================================
+
+def json_body(model: Type[ModelT]) -> Callable[[Request], Awaitable[ModelT]]:
+    """
+    Build a dependency that validates the raw JSON request body as `model`.
+
+    pydantic-core parses and validates the bytes in a single pass, instead
+    of FastAPI's json.loads() followed by validating the resulting dict.
+    Invalid bodies still produce the usual 422 response. Pair with
+    ``openapi_extra=json_body_openapi(model)`` to keep the docs.
+    """
+    async def parse(request: Request) -> ModelT:
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            # Same locations FastAPI reports for body fields: ("body", ...)
+            raise RequestValidationError([
+                {**error, "loc": ("body", *error["loc"])}
+                for error in e.errors(include_url=False)
+            ])
+    return parse
+
+
+def json_body_openapi(model: Type[BaseModel]) -> Dict[str, Any]:
+    """OpenAPI request body description for a json_body() route."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}},
+        }
+    }
 
 
 # =============================================================================
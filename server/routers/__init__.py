@@ -1,7 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""Server Routers Package"""
+"""Server Routers Package
 
-from server.routers import chat, vision, image
+Each module defines ``router`` with its own prefix and tags; import the
+modules directly (``from server.routers import chat``). Nothing is
+imported eagerly: attribute access (``server.routers.chat``) imports the
+module on first use (PEP 562).
+"""
 
-__all__ = ["chat", "vision", "image"]
+import importlib
+
+__all__ = ["chat", "vision", "image", "multimodal"]
+
+
+def __getattr__(name: str):
+    """Import router modules on first access."""
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return importlib.import_module(f"{__name__}.{name}")
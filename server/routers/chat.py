@@ -7,22 +7,25 @@ Endpoints for text chat with Qwen3 model.
 Author: Generated with love by Harei-chan
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 
 from server.models.schemas import (
     ChatRequest,
     ChatResponse,
     StatusResponse,
+    json_body,
+    json_body_openapi,
 )
 from server.services.chat_service import chat_service
+from server.utils.sse import coalesce
 
 
-router = APIRouter()
+router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
 
-@router.post("/", summary="Send a chat message")
-async def chat(request: ChatRequest):
+@router.post("/", summary="Send a chat message", openapi_extra=json_body_openapi(ChatRequest))
+async def chat(request: ChatRequest = Depends(json_body(ChatRequest))):
     """
     Send a message and get a response from Qwen3.
 
@@ -41,11 +44,11 @@ async def chat(request: ChatRequest):
     try:
         if request.stream:
             return StreamingResponse(
-                chat_service.stream_response(
+                coalesce(chat_service.stream_response(
                     message=request.message,
                     conversation_id=request.conversation_id,
                     enable_thinking=request.enable_thinking
-                ),
+                )),
                 media_type="text/event-stream",
                 headers={
                     "Cache-Control": "no-cache",
@@ -76,7 +79,7 @@ async def get_conversation(conversation_id: str):
 
     - **conversation_id**: The conversation ID to retrieve
     """
-    history = chat_service.get_conversation(conversation_id)
+    history = await chat_service.get_conversation(conversation_id)
 
     if history is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -94,7 +97,7 @@ async def clear_conversation(conversation_id: str):
 
     - **conversation_id**: The conversation ID to clear
     """
-    success = chat_service.clear_conversation(conversation_id)
+    success = await chat_service.clear_conversation(conversation_id)
 
     if not success:
         raise HTTPException(status_code=404, detail="Conversation not found")
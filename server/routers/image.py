@@ -7,26 +7,61 @@ Endpoints for text-to-image generation with LCM-Dreamshaper.
 Author: Generated with love by Harei-chan
 """
 
+import heapq
 import os
 from pathlib import Path
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse, FileResponse, Response
 
 from server.models.schemas import (
     ImageGenerateRequest,
     ImageGenerateResponse,
     StatusResponse,
+    json_body,
+    json_body_openapi,
 )
 from server.services.image_service import image_service
+from server.utils.sse import coalesce
 from core.config import settings
 
 
-router = APIRouter()
+router = APIRouter(prefix="/api/image", tags=["Image Generation"])
 
+# Generated images are never rewritten under the same name
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-@router.post("/generate", summary="Generate an image from text")
-async def generate_image(request: ImageGenerateRequest):
+# Resolved once at import; requests only join a validated name onto it
+_OUTPUT_DIR = os.fspath(Path(settings.output_dir).resolve())
+
+
+def _output_file(filename: str) -> str:
+    """
+    Build a generated image's path, rejecting anything outside output_dir.
+
+    Pure string checks, no Path objects or filesystem calls: a name with
+    no separators, no leading dot and no ".." can only refer to an entry
+    directly inside output_dir.
+
+    Raises:
+        HTTPException: 403 if the filename could escape the output directory
+    """
+    if (
+        not filename
+        or filename.startswith(".")
+        or "/" in filename
+        or "\\" in filename
+        or ".." in filename
+        or "\0" in filename
+    ):
+        raise HTTPException(status_code=403, detail="Access denied")
+    return os.path.join(_OUTPUT_DIR, filename)
+
+
+@router.post("/generate", summary="Generate an image from text",
+             openapi_extra=json_body_openapi(ImageGenerateRequest))
+async def generate_image(request: ImageGenerateRequest = Depends(json_body(ImageGenerateRequest))):
     """
     Generate an image from a text prompt.
 
@@ -46,14 +81,14 @@ async def generate_image(request: ImageGenerateRequest):
     """
     try:
         return StreamingResponse(
-            image_service.generate_with_progress(
+            coalesce(image_service.generate_with_progress(
                 prompt=request.prompt,
                 negative_prompt=request.negative_prompt,
                 width=request.width,
                 height=request.height,
                 seed=request.seed,
                 num_steps=request.num_steps,
-            ),
+            )),
             media_type="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
@@ -68,8 +103,9 @@ async def generate_image(request: ImageGenerateRequest):
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
-@router.post("/generate/sync", response_model=ImageGenerateResponse, summary="Generate image (non-streaming)")
-async def generate_image_sync(request: ImageGenerateRequest):
+@router.post("/generate/sync", response_model=ImageGenerateResponse, summary="Generate image (non-streaming)",
+             openapi_extra=json_body_openapi(ImageGenerateRequest))
+async def generate_image_sync(request: ImageGenerateRequest = Depends(json_body(ImageGenerateRequest))):
     """
     Generate an image without streaming (waits for completion).
 
@@ -93,60 +129,101 @@ async def generate_image_sync(request: ImageGenerateRequest):
 
 
 @router.get("/download/{filename}", summary="Download a generated image")
-async def download_image(filename: str):
+def download_image(filename: str, request: Request):
     """
     Download a generated image by filename.
 
+    Responses carry an ETag and a long-lived Cache-Control; a matching
+    If-None-Match gets an empty 304. (Sync handler: the path resolution
+    and stat() run in the threadpool, off the event loop.)
+
     - **filename**: The filename of the generated image
     """
-    file_path = Path(settings.output_dir) / filename
+    file_path = _output_file(filename)
 
-    if not file_path.exists():
+    try:
+        stat = os.stat(file_path)
+    except OSError:
         raise HTTPException(status_code=404, detail="Image not found")
 
-    # Security check: ensure the path is within output_dir
-    try:
-        file_path.resolve().relative_to(Path(settings.output_dir).resolve())
-    except ValueError:
-        raise HTTPException(status_code=403, detail="Access denied")
+    headers = {
+        "etag": f'W/"{stat.st_size}-{int(stat.st_mtime)}"',
+        "cache-control": _IMMUTABLE_CACHE_CONTROL,
+    }
+    if request.headers.get("if-none-match") == headers["etag"]:
+        return Response(status_code=304, headers=headers)
 
     return FileResponse(
-        path=str(file_path),
+        path=file_path,
         filename=filename,
-        media_type="image/png"
+        media_type="image/png",
+        headers=headers,
+        stat_result=stat,
     )
 
 
+# (dir_mtime, entries, newest): (filename, mtime) listing of output_dir
+# plus its newest-first prefix sorted so far, valid while the directory's
+# own mtime (changed by any create/delete/rename inside it) stays the same.
+# Handlers run in the threadpool, so the tuple is only ever replaced as a
+# whole: every thread works on one consistent snapshot, and a late write
+# from a stale snapshot merely causes a rescan on the next call.
+_listing_cache: Tuple[Optional[int], List[Tuple[str, float]], List[Tuple[str, float]]] = (None, [], [])
+
+
+def _newest_output_pngs(output_dir: str, count: int) -> Tuple[List[Tuple[str, float]], int]:
+    """
+    Return the newest `count` (filename, mtime) PNG entries of output_dir,
+    newest first, and the total number of PNGs.
+
+    Only as much of the listing is ordered as requested: a page near the
+    front is a heap top-K selection (O(N log K)) instead of a full sort.
+    """
+    global _listing_cache
+    dir_mtime = os.stat(output_dir).st_mtime_ns
+    cached_mtime, entries, newest = _listing_cache
+    if dir_mtime != cached_mtime:
+        with os.scandir(output_dir) as it:
+            entries = [
+                (entry.name, entry.stat().st_mtime)
+                for entry in it
+                if entry.name.endswith(".png") and entry.is_file()
+            ]
+        newest = []
+        _listing_cache = (dir_mtime, entries, newest)
+
+    if count > len(newest) and len(newest) < len(entries):
+        if count * 4 < len(entries):
+            newest = heapq.nlargest(count, entries, key=lambda e: e[1])
+        else:
+            newest = sorted(entries, key=lambda e: e[1], reverse=True)
+        _listing_cache = (dir_mtime, entries, newest)
+    return newest[:count], len(entries)
+
+
 @router.get("/list", summary="List generated images")
-async def list_images(limit: int = 20, offset: int = 0):
+def list_images(limit: int = 20, offset: int = 0):
     """
     List recently generated images.
 
     - **limit**: Maximum number of images to return (default 20)
     - **offset**: Number of images to skip (for pagination)
     """
-    output_dir = Path(settings.output_dir)
-
-    if not output_dir.exists():
+    # Sync handler: FastAPI runs it in the threadpool, so the directory
+    # scan never blocks the event loop
+    if not os.path.isdir(settings.output_dir):
         return {"images": [], "total": 0}
 
-    # Get all PNG files sorted by modification time (newest first)
-    files = sorted(
-        output_dir.glob("*.png"),
-        key=lambda f: f.stat().st_mtime,
-        reverse=True
-    )
+    newest, total = _newest_output_pngs(settings.output_dir, offset + limit)
 
-    total = len(files)
-    files = files[offset:offset + limit]
-
-    images = []
-    for f in files:
-        images.append({
-            "filename": f.name,
-            "url": f"/outputs/{f.name}",
-            "created_at": f.stat().st_mtime
-        })
+    images = [
+        {
+            "filename": name,
+            "url": f"/outputs/{name}",
+            "created_at": mtime
+        }
+        for name, mtime in newest[offset:]
+    ]
 
     return {
         "images": images,
@@ -157,26 +234,19 @@ async def list_images(limit: int = 20, offset: int = 0):
 
 
 @router.delete("/{filename}", response_model=StatusResponse, summary="Delete a generated image")
-async def delete_image(filename: str):
+def delete_image(filename: str):
     """
-    Delete a generated image.
+    Delete a generated image (sync handler, run in the threadpool).
 
     - **filename**: The filename of the image to delete
     """
-    file_path = Path(settings.output_dir) / filename
-
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Image not found")
-
-    # Security check
-    try:
-        file_path.resolve().relative_to(Path(settings.output_dir).resolve())
-    except ValueError:
-        raise HTTPException(status_code=403, detail="Access denied")
+    file_path = _output_file(filename)
 
     try:
         os.remove(file_path)
         return StatusResponse(status="Image deleted", success=True)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
     except OSError as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete: {str(e)}")
 
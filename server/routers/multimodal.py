@@ -4,22 +4,17 @@
 
 import logging
 from typing import Optional
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from pathlib import Path
-import shutil
 
+from server.models.schemas import json_body, json_body_openapi
 from server.services.multimodal_service import multimodal_service
+from server.utils.sse import coalesce
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/multimodal", tags=["Multimodal Chat"])
-
-# Upload directory
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
+router = APIRouter(prefix="/api/multimodal", tags=["Multimodal Chat"])
 
 class MultimodalChatRequest(BaseModel):
     """Multimodal chat request (for JSON payload without file upload)"""
@@ -37,8 +32,9 @@ class MultimodalChatResponse(BaseModel):
     image_url: Optional[str] = None
 
 
-@router.post("/chat", summary="Multimodal chat - text only")
-async def multimodal_chat(request: MultimodalChatRequest):
+@router.post("/chat", summary="Multimodal chat - text only",
+             openapi_extra=json_body_openapi(MultimodalChatRequest))
+async def multimodal_chat(request: MultimodalChatRequest = Depends(json_body(MultimodalChatRequest))):
     """
     Multimodal chat with text input only.
 
@@ -63,12 +59,12 @@ async def multimodal_chat(request: MultimodalChatRequest):
     try:
         if request.stream:
             return StreamingResponse(
-                multimodal_service.stream_response(
+                coalesce(multimodal_service.stream_response(
                     message=request.message,
                     conversation_id=request.conversation_id,
                     image_path=None,
                     enable_thinking=request.enable_thinking
-                ),
+                )),
                 media_type="text/event-stream",
                 headers={
                     "Cache-Control": "no-cache",
@@ -126,12 +122,12 @@ async def multimodal_chat_with_image(
 
         # Stream response - pass image_id instead of path
         return StreamingResponse(
-            multimodal_service.stream_response(
+            coalesce(multimodal_service.stream_response(
                 message=message,
                 conversation_id=conversation_id,
                 image_id=image_id,
                 enable_thinking=enable_thinking
-            ),
+            )),
             media_type="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
@@ -7,7 +7,7 @@ Endpoints for image understanding with Qwen2-VL.
 Author: Generated with love by Harei-chan
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from fastapi.responses import StreamingResponse
 
 from server.models.schemas import (
@@ -15,11 +15,14 @@ from server.models.schemas import (
     VisionAskRequest,
     VisionResponse,
     StatusResponse,
+    json_body,
+    json_body_openapi,
 )
 from server.services.vision_service import vision_service
+from server.utils.sse import coalesce
 
 
-router = APIRouter()
+router = APIRouter(prefix="/api/vision", tags=["Vision"])
 
 
 @router.post("/upload", response_model=VisionUploadResponse, summary="Upload an image")
@@ -41,8 +44,9 @@ async def upload_image(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
-@router.post("/ask", summary="Ask a question about an image")
-async def ask_about_image(request: VisionAskRequest):
+@router.post("/ask", summary="Ask a question about an image",
+             openapi_extra=json_body_openapi(VisionAskRequest))
+async def ask_about_image(request: VisionAskRequest = Depends(json_body(VisionAskRequest))):
     """
     Ask a question about a previously uploaded image.
 
@@ -58,10 +62,10 @@ async def ask_about_image(request: VisionAskRequest):
     try:
         if request.stream:
             return StreamingResponse(
-                vision_service.stream_response(
+                coalesce(vision_service.stream_response(
                     image_id=request.image_id,
                     question=request.question
-                ),
+                )),
                 media_type="text/event-stream",
                 headers={
                     "Cache-Control": "no-cache",
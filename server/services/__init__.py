@@ -1,10 +1,37 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""Server Services Package"""
+"""Server Services Package
+
+Service modules are imported on first attribute access (PEP 562), so
+importing one service does not load the others.
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from server.services.chat_service import ChatService
+    from server.services.vision_service import VisionService
+    from server.services.image_service import ImageService
+    from server.services.multimodal_service import MultimodalService
+
+# Exports resolved on first access: name -> module
+_LAZY_IMPORTS = {
+    "ChatService": "server.services.chat_service",
+    "VisionService": "server.services.vision_service",
+    "ImageService": "server.services.image_service",
+    "MultimodalService": "server.services.multimodal_service",
+}
+
+
+def __getattr__(name: str):
+    """Import service modules on first access."""
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value  # Cache so __getattr__ is not hit again
+    return value
 
-from server.services.chat_service import ChatService
-from server.services.vision_service import VisionService
-from server.services.image_service import ImageService
-from server.services.multimodal_service import MultimodalService
 
 __all__ = ["ChatService", "VisionService", "ImageService", "MultimodalService"]
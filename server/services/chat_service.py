@@ -9,19 +9,34 @@ Performance optimized by Harei-chan (￣▽￣)ノ
 """
 
 import asyncio
+import functools
 import json
 import logging
+import os
+import threading
 import time
 import uuid
-import os
 import sys
+from collections import OrderedDict
 from pathlib import Path
-from typing import AsyncGenerator, Optional, Dict, List
+from typing import AsyncGenerator, Callable, Iterator, Optional, Dict, List, Tuple
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from core.config import settings
+from core.config import settings, default_thread_count
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import redis.asyncio as aioredis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -31,13 +46,176 @@ logging.basicConfig(
 )
 
 
+# =============================================================================
+# SSE Encoding
+# =============================================================================
+
+if HAS_ORJSON:
+    _json_bytes = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_bytes(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+    _json_loads = json.loads
+
+# Event heads are constant per type; only the JSON-encoded content varies
+_THINKING_HEAD = b'data: {"type":"thinking","content":'
+_THINKING_STREAM_HEAD = b'data: {"type":"thinking_stream","content":'
+_RESPONSE_HEAD = b'data: {"type":"response","content":'
+_ERROR_HEAD = b'data: {"type":"error","content":'
+_DONE_HEAD = b'data: {"type":"done","conversation_id":'
+_EVENT_TAIL = b"}\n\n"
+
+
+def _sse(head: bytes, value: str) -> bytes:
+    """Encode an SSE event from its constant head and a string value."""
+    return head + _json_bytes(value) + _EVENT_TAIL
+
+
+# =============================================================================
+# Streaming Helpers
+# =============================================================================
+
+_THINK_CLOSE = "</think>"
+
+
+def _take_stripped(pending: List[str], at_start: bool) -> str:
+    """
+    Take the text to stream from `pending` (modified in place).
+
+    Emitting the results gives the same text as stripping the whole section
+    at the end, but only joins the not yet streamed chunks: trailing
+    whitespace stays in `pending` until something follows it, and leading
+    whitespace is dropped while nothing has been emitted yet (`at_start`).
+    """
+    text = "".join(pending)
+    pending.clear()
+    if at_start:
+        text = text.lstrip()
+    body = text.rstrip()
+    if len(body) < len(text):
+        pending.append(text[len(body):])
+    return body
+
+
+# =============================================================================
+# Prompt Template
+# =============================================================================
+
+# Default to Chinese output, but respect user's language preference if specified
+_BASE_INSTRUCTION = (
+    "You are Qwen, a helpful assistant. "
+    "默认使用简体中文回复用户，包括思考过程也使用中文。"
+    "如果用户明确要求使用其他语言，则按照用户要求的语言进行思考和回复。"
+)
+
+# System block and assistant opener, keyed by enable_thinking
+_SYSTEM_BLOCKS = {
+    True: f"<|im_start|>system\n{_BASE_INSTRUCTION} 请用中文一步一步思考后再回答。<|im_end|>\n",
+    False: f"<|im_start|>system\n{_BASE_INSTRUCTION}<|im_end|>\n",
+}
+_ASSISTANT_OPENERS = {
+    True: "<|im_start|>assistant\n<think>\n",
+    False: "<|im_start|>assistant\n",
+}
+
+# One user or assistant message
+_TURN_TEMPLATE = "<|im_start|>{role}\n{content}<|im_end|>\n"
+
+
+def _gpu_offload_available(llama_cpp) -> bool:
+    """Whether this llama.cpp build can offload layers to a visible GPU."""
+    supports_gpu = getattr(llama_cpp, "llama_supports_gpu_offload", None)
+    if supports_gpu is None or not supports_gpu():
+        return False
+    # The build flag says nothing about devices: Metal is always there, but
+    # configure_environment() hides CUDA devices (CUDA_VISIBLE_DEVICES="")
+    return sys.platform == "darwin" or os.environ.get("CUDA_VISIBLE_DEVICES", "") != ""
+
+
+# KV cache types accepted by chat_kv_cache_type (llama.cpp GGML_TYPE_* names)
+_KV_CACHE_TYPES = ("f16", "q8_0", "q5_1", "q5_0", "q4_1", "q4_0")
+
+
+# Redis list holding a conversation's JSON-encoded messages
+_REDIS_KEY = "chat:{}"
+
+
+# Marks the end of a _ThreadedStream's queue
+_STREAM_END = object()
+
+
+class _ThreadedStream:
+    """
+    Iterate a blocking llama-cpp completion stream in a worker thread.
+
+    The worker pushes each chunk's text onto an asyncio.Queue through
+    call_soon_threadsafe, so the event loop keeps serving other requests
+    between tokens. Use as ``async for text in stream``, then close().
+    """
+
+    def __init__(self, completion: Iterator[dict]):
+        self._completion = completion
+        self._queue: "asyncio.Queue" = asyncio.Queue()
+        self._stop = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker: Optional["asyncio.Future"] = None
+
+    def __aiter__(self) -> "_ThreadedStream":
+        if self._worker is None:
+            self._loop = asyncio.get_running_loop()
+            self._worker = self._loop.run_in_executor(None, self._produce)
+        return self
+
+    async def __anext__(self) -> str:
+        item = await self._queue.get()
+        if item is _STREAM_END:
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def _produce(self) -> None:
+        """Worker thread: drain the completion into the queue."""
+        put = functools.partial(self._loop.call_soon_threadsafe, self._queue.put_nowait)
+        try:
+            for output in self._completion:
+                if self._stop.is_set():
+                    break
+                put(output["choices"][0]["text"])
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(self._completion, "close", None)
+            if close is not None:
+                close()
+            try:
+                put(_STREAM_END)
+            except RuntimeError:
+                pass  # Event loop already closed
+
+    def close(self, on_done: Callable[[], None]) -> None:
+        """
+        Stop the worker after its current token.
+
+        on_done runs on the event loop once the worker has let go of the
+        model (immediately if iteration never started).
+        """
+        self._stop.set()
+        if self._worker is None:
+            on_done()
+        else:
+            self._worker.add_done_callback(lambda _: on_done())
+
+
 class ChatService:
     """
     Chat service for managing conversations with Qwen3 model.
 
     Features:
     - Lazy model loading (only loads when first request comes in)
-    - Conversation history management
+    - Generation slots: each request holds one Llama context at a time
+    - Conversation history management (optionally shared via Redis)
     - Streaming response generation
     - Thinking mode support (extracts <think> tags)
     """
@@ -45,7 +223,30 @@ class ChatService:
     def __init__(self):
         self._llm = None
         self._is_loading = False
-        self._conversations: Dict[str, List[dict]] = {}
+        # Idle Llama contexts (settings.chat_parallel of them)
+        self._idle_llms: "asyncio.Queue" = asyncio.Queue()
+        # Conversations in least recently used order, with last-use times
+        self._conversations: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        # Optional shared store: conversations then survive restarts and
+        # follow the user across uvicorn workers
+        self._redis = None
+        # Conversations whose last Redis write failed: Redis lacks some of
+        # their messages, so the local copy wins until it is rewritten
+        self._redis_behind: set = set()
+        if settings.redis_url:
+            if HAS_REDIS:
+                self._redis = aioredis.from_url(settings.redis_url)
+            else:
+                logger.warning("⚠️ redis_url is set but redis is not installed (pip install redis)")
+        # Token ids per conversation message, filled lazily by _build_prompt
+        self._history_tokens: Dict[str, List[List[int]]] = {}
+        # Token budget for a conversation's history: the context minus room
+        # for the reply (at most half the context) and the new message
+        n_ctx = settings.chat_context_length
+        self._history_token_budget = n_ctx - min(settings.chat_max_tokens, n_ctx // 2) - 512
+        # enable_thinking -> (system block, assistant opener) token ids
+        self._template_tokens: Optional[Dict[bool, Tuple[List[int], List[int]]]] = None
 
     @property
     def is_loaded(self) -> bool:
@@ -62,26 +263,76 @@ class ChatService:
         logger.info("Starting to load chat model...")
 
         try:
-            from llama_cpp import Llama
+            import llama_cpp
+            from llama_cpp import Llama, LlamaRAMCache
 
             # Use smart model loading: local first, download if not present
             model_path = settings.get_chat_model_path()
 
-            # Determine thread count (0 = auto)
-            n_threads = settings.chat_n_threads if settings.chat_n_threads > 0 else (os.cpu_count() or 4)
+            # Determine thread count (0 = auto), shared between the slots
+            n_threads = settings.chat_n_threads if settings.chat_n_threads > 0 else default_thread_count()
+            n_slots = max(1, settings.chat_parallel)
+            n_threads = max(1, n_threads // n_slots)
 
             logger.info(f"Model path: {model_path}")
             logger.info(f"Context length: {settings.chat_context_length}")
-            logger.info(f"CPU threads: {n_threads}")
-            logger.info(f"GPU layers: {settings.chat_n_gpu_layers}")
-
-            self._llm = Llama(
-                model_path=model_path,
-                n_ctx=settings.chat_context_length,
-                n_threads=n_threads,
-                n_gpu_layers=settings.chat_n_gpu_layers,
-                verbose=False,
-            )
+            logger.info(f"Generation slots: {n_slots}")
+            logger.info(f"CPU threads: {n_threads}{' per slot' if n_slots > 1 else ''}")
+            # Auto (None): offload every layer when a GPU is usable, else CPU
+            n_gpu_layers = settings.chat_n_gpu_layers
+            if n_gpu_layers is None:
+                n_gpu_layers = -1 if _gpu_offload_available(llama_cpp) else 0
+                if n_gpu_layers:
+                    logger.info("GPU offload available: offloading all layers")
+            logger.info(f"GPU layers: {n_gpu_layers}")
+            logger.info(f"KV cache type: {settings.chat_kv_cache_type}")
+
+            llm_kwargs = {
+                "n_ctx": settings.chat_context_length,
+                "n_threads": n_threads,
+                "n_threads_batch": n_threads,
+                "n_gpu_layers": n_gpu_layers,
+                "n_batch": settings.chat_n_batch,
+                "n_ubatch": settings.chat_n_ubatch,
+                "flash_attn": settings.chat_flash_attn,
+                "use_mmap": settings.chat_use_mmap,
+                "use_mlock": settings.chat_use_mlock,
+                "verbose": False,
+            }
+            kv_type = settings.chat_kv_cache_type.lower()
+            if kv_type not in _KV_CACHE_TYPES:
+                raise ValueError(
+                    f"Invalid chat_kv_cache_type {settings.chat_kv_cache_type!r} "
+                    f"(expected one of: {', '.join(_KV_CACHE_TYPES)})"
+                )
+            if kv_type != "f16":
+                # Quantized KV cache: less memory traffic per attention step
+                ggml_type = getattr(llama_cpp, f"GGML_TYPE_{kv_type.upper()}")
+                llm_kwargs["type_k"] = llm_kwargs["type_v"] = ggml_type
+
+            # One context per slot. Only CPU weights that are memory-mapped
+            # are shared between them; offloaded layers, or a model read
+            # into RAM with mmap off, are loaded again for every slot.
+            if n_slots > 1 and (n_gpu_layers != 0 or not settings.chat_use_mmap):
+                logger.warning(
+                    f"⚠️ chat_parallel={n_slots} loads {n_slots} copies of the model weights "
+                    f"(GPU offload or mmap disabled); lower it if memory runs short"
+                )
+            llms = [Llama(model_path=model_path, **llm_kwargs) for _ in range(n_slots)]
+
+            # Snapshot the KV state after each turn, keyed by its tokens: the
+            # next turn of any recent conversation restores the longest
+            # matching snapshot and only prefills the newly appended part.
+            # Least recently used snapshots are evicted past the budget.
+            if settings.chat_prompt_cache_bytes > 0:
+                for llm in llms:
+                    llm.set_cache(LlamaRAMCache(capacity_bytes=settings.chat_prompt_cache_bytes // n_slots))
+                logger.info(f"Prompt cache: {settings.chat_prompt_cache_bytes >> 20} MiB")
+
+            for llm in llms:
+                self._idle_llms.put_nowait(llm)
+            self._llm = llms[0]
+            self._get_template_tokens(True)  # Tokenize the fixed prompt parts now
 
             logger.info("✅ Chat model loaded successfully!")
             logger.info("=" * 50)
@@ -93,49 +344,192 @@ class ChatService:
 
         self._is_loading = False
 
-    def _get_llm(self):
-        """Get the LLM instance, loading if necessary."""
+    async def _acquire_llm(self):
+        """
+        Take an idle Llama context, loading the model if necessary.
+
+        Waits (FIFO) while all slots are generating. A context is only ever
+        used by one request at a time; hand it back with _release_llm().
+        """
         if self._llm is None:
             self._load_model()
-        return self._llm
+        return await self._idle_llms.get()
+
+    def _release_llm(self, llm) -> None:
+        """Return a context taken with _acquire_llm() to the idle pool."""
+        self._idle_llms.put_nowait(llm)
+
+    def _tokenize(self, text: str, add_bos: bool = False) -> List[int]:
+        """Tokenize prompt text (special tokens such as <|im_start|> included)."""
+        return self._llm.tokenize(text.encode("utf-8"), add_bos=add_bos, special=True)
+
+    def _get_template_tokens(self, enable_thinking: bool) -> Tuple[List[int], List[int]]:
+        """
+        Token ids of the fixed system block and assistant opener for a mode.
+
+        Tokenized once at model load (all slots share the same vocabulary).
+        """
+        if self._template_tokens is None:
+            self._template_tokens = {
+                thinking: (
+                    self._tokenize(_SYSTEM_BLOCKS[thinking], add_bos=True),
+                    self._tokenize(_ASSISTANT_OPENERS[thinking]),
+                )
+                for thinking in (True, False)
+            }
+        return self._template_tokens[enable_thinking]
+
+    def _open_conversation(self, conversation_id: str) -> List[dict]:
+        """
+        Get a conversation's messages (creating it if needed) and mark it
+        as most recently used.
+
+        Evicts conversations past settings.chat_max_conversations or idle
+        for longer than settings.chat_conversation_ttl. Only called from
+        the event loop, so no locking is needed.
+        """
+        now = time.monotonic()
+        messages = self._conversations.get(conversation_id)
+        if messages is None:
+            messages = self._conversations[conversation_id] = []
+        else:
+            self._conversations.move_to_end(conversation_id)
+        self._last_used[conversation_id] = now
+        self._evict_conversations(now)
+        return messages
+
+    def _evict_conversations(self, now: float) -> None:
+        """Drop least recently used conversations over the size or age limit."""
+        max_conversations = max(1, settings.chat_max_conversations)
+        while self._conversations:
+            oldest = next(iter(self._conversations))
+            if (
+                len(self._conversations) <= max_conversations
+                and now - self._last_used[oldest] < settings.chat_conversation_ttl
+            ):
+                break
+            self._drop_conversation(oldest)
+
+    def _drop_conversation(self, conversation_id: str) -> None:
+        """Forget a conversation's messages, cached token ids and sync state."""
+        del self._conversations[conversation_id]
+        del self._last_used[conversation_id]
+        self._history_tokens.pop(conversation_id, None)
+        self._redis_behind.discard(conversation_id)
+
+    async def _sync_conversation(self, conversation_id: str) -> None:
+        """
+        Refresh a conversation from Redis, the source of truth when enabled.
+
+        Another worker may have extended or cleared it. Cached token ids
+        are kept only if the local copy was already up to date. A local
+        copy that Redis is missing writes for is kept as is.
+        """
+        if self._redis is None or conversation_id in self._redis_behind:
+            return
+        try:
+            raw = await self._redis.lrange(_REDIS_KEY.format(conversation_id), 0, -1)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis read failed, using local history: {e}")
+            return
+
+        stored = [_json_loads(item) for item in raw]
+        if not stored:
+            # Cleared by another worker or expired (Redis has no empty lists)
+            if conversation_id in self._conversations:
+                self._drop_conversation(conversation_id)
+            return
+        messages = self._open_conversation(conversation_id)
+        if stored != messages:
+            messages[:] = stored
+            self._history_tokens.pop(conversation_id, None)
+
+    async def _persist_turn(self, conversation_id: str) -> None:
+        """
+        Write the latest exchange (and any trimming) to Redis in one round trip.
+
+        The list is trimmed to the local length counted from its end, so it
+        ends up holding the same messages even if the two had diverged.
+        After a failed write the whole conversation is rewritten instead.
+        """
+        if self._redis is None:
+            return
+        key = _REDIS_KEY.format(conversation_id)
+        messages = self._conversations.get(conversation_id)
+        if not messages:
+            return
+        rewrite = conversation_id in self._redis_behind
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                if rewrite:
+                    pipe.delete(key)
+                pipe.rpush(key, *(_json_bytes(msg) for msg in (messages if rewrite else messages[-2:])))
+                pipe.ltrim(key, -len(messages), -1)
+                pipe.expire(key, settings.chat_conversation_ttl)
+                await pipe.execute()
+        except Exception as e:
+            self._redis_behind.add(conversation_id)
+            logger.warning(f"⚠️ Redis write failed, history kept locally only: {e}")
+        else:
+            self._redis_behind.discard(conversation_id)
+
+    def _get_history_tokens(self, conversation_id: str) -> List[List[int]]:
+        """Token ids of each message of a conversation (new ones tokenized now)."""
+        history = self._history_tokens.setdefault(conversation_id, [])
+        for msg in self._conversations[conversation_id][len(history):]:
+            if msg["role"] in ("user", "assistant"):
+                history.append(self._tokenize(_TURN_TEMPLATE.format(**msg)))
+            else:
+                history.append([])  # Keep history aligned with messages
+        return history
+
+    def _append_turn(self, conversation_id: str, message: str, response: str) -> None:
+        """
+        Store a user/assistant exchange, then trim the conversation.
+
+        The oldest exchanges are dropped while the history exceeds
+        _history_token_budget, so its prompt always leaves room for the
+        reply within the context window.
+        """
+        # Re-opened: the conversation may have been evicted while generating
+        messages = self._open_conversation(conversation_id)
+        messages.append({"role": "user", "content": message})
+        messages.append({"role": "assistant", "content": response})
+
+        history = self._get_history_tokens(conversation_id)
+        total = sum(map(len, history))
+        drop = 0
+        while total > self._history_token_budget and drop + 2 < len(messages):
+            total -= len(history[drop]) + len(history[drop + 1])
+            drop += 2
+        if drop:
+            del messages[:drop]
+            del history[:drop]
+            logger.info(f"   ✂️  Trimmed {drop} old messages (history: {total} tokens)")
 
     def _build_prompt(
         self,
         message: str,
         conversation_id: Optional[str] = None,
         enable_thinking: bool = True
-    ) -> str:
-        """Build the prompt with conversation history."""
-        history = ""
+    ) -> List[int]:
+        """
+        Build the prompt with conversation history, as token ids.
 
+        The system block and assistant opener are tokenized once per model
+        and each history message once, so only the new user message is
+        tokenized per request.
+        """
+        system_tokens, assistant_tokens = self._get_template_tokens(enable_thinking)
+
+        tokens = list(system_tokens)
         if conversation_id and conversation_id in self._conversations:
-            for msg in self._conversations[conversation_id]:
-                if msg["role"] == "user":
-                    history += f"<|im_start|>user\n{msg['content']}<|im_end|>\n"
-                elif msg["role"] == "assistant":
-                    history += f"<|im_start|>assistant\n{msg['content']}<|im_end|>\n"
-
-        # Choose system prompt and assistant start based on thinking mode
-        # Default to Chinese output, but respect user's language preference if specified
-        base_instruction = (
-            "You are Qwen, a helpful assistant. "
-            "默认使用简体中文回复用户，包括思考过程也使用中文。"
-            "如果用户明确要求使用其他语言，则按照用户要求的语言进行思考和回复。"
-        )
-        if enable_thinking:
-            system_prompt = f"{base_instruction} 请用中文一步一步思考后再回答。"
-            assistant_start = "<think>\n"
-        else:
-            system_prompt = base_instruction
-            assistant_start = ""
+            for message_tokens in self._get_history_tokens(conversation_id):
+                tokens.extend(message_tokens)
 
-        prompt = f"""<|im_start|>system
-{system_prompt}<|im_end|>
-{history}<|im_start|>user
-{message}<|im_end|>
-<|im_start|>assistant
-{assistant_start}"""
-        return prompt
+        tokens.extend(self._tokenize(_TURN_TEMPLATE.format(role="user", content=message)))
+        tokens.extend(assistant_tokens)
+        return tokens
 
     def _parse_thinking_simple(self, text: str) -> tuple[str, str]:
         """
@@ -161,7 +555,7 @@ class ChatService:
         message: str,
         conversation_id: Optional[str] = None,
         enable_thinking: bool = True
-    ) -> AsyncGenerator[str, None]:
+    ) -> AsyncGenerator[bytes, None]:
         """
         Generate streaming response for a chat message.
         Optimized for performance with real-time streaming.
@@ -172,7 +566,7 @@ class ChatService:
             enable_thinking: Whether to enable thinking mode (deep reasoning)
 
         Yields:
-            SSE formatted events with thinking and response content
+            SSE formatted events (UTF-8 bytes) with thinking and response content
         """
         start_time = time.time()
         logger.info("=" * 60)
@@ -180,42 +574,48 @@ class ChatService:
         logger.info(f"   User message: {message[:80]}{'...' if len(message) > 80 else ''}")
         logger.info(f"   Thinking mode: {'enabled' if enable_thinking else 'disabled'}")
 
-        # Get LLM instance
+        # Get an idle LLM context (loads the model on first use)
         logger.info("   Loading LLM...")
         llm_start = time.time()
-        llm = self._get_llm()
+        llm = await self._acquire_llm()
         logger.info(f"   LLM ready (took {time.time() - llm_start:.2f}s)")
 
-        # Generate conversation ID if not provided
-        if not conversation_id:
-            conversation_id = str(uuid.uuid4())
-
-        logger.info(f"   Conversation ID: {conversation_id[:8]}...")
-
-        # Initialize conversation history
-        if conversation_id not in self._conversations:
-            self._conversations[conversation_id] = []
-            logger.info("   New conversation started")
-        else:
-            logger.info(f"   Continuing conversation ({len(self._conversations[conversation_id])} messages)")
-
-        prompt = self._build_prompt(message, conversation_id, enable_thinking)
-        logger.info(f"   Prompt built: {len(prompt)} chars")
-
-        # State tracking
-        full_response = ""
-        in_thinking = enable_thinking  # Only track thinking state if enabled
-        last_sent_thinking_len = 0
-        last_sent_response_len = 0
-        token_count = 0
-        first_token_time = None
+        stream = None
+        try:
+            # Generate conversation ID if not provided
+            if not conversation_id:
+                conversation_id = str(uuid.uuid4())
+
+            logger.info(f"   Conversation ID: {conversation_id[:8]}...")
+
+            # Initialize conversation history
+            await self._sync_conversation(conversation_id)
+            is_new = conversation_id not in self._conversations
+            messages = self._open_conversation(conversation_id)
+            if is_new:
+                logger.info("   New conversation started")
+            else:
+                logger.info(f"   Continuing conversation ({len(messages)} messages)")
+
+            prompt = self._build_prompt(message, conversation_id, enable_thinking)
+            logger.info(f"   Prompt built: {len(prompt)} tokens")
+
+            # State tracking
+            parts: List[str] = []  # Generated text chunks, joined only when needed
+            text_len = 0
+            in_thinking = enable_thinking  # Only track thinking state if enabled
+            think_end = None  # Index just past </think> in the text, once seen
+            tail = ""  # Last chars before the current token (a split </think>)
+            unsent: List[str] = []  # Current section's text not yet streamed
+            at_start = True  # Nothing streamed from the current section yet
+            token_count = 0
+            first_token_time = None
 
-        logger.info("-" * 60)
-        logger.info("🚀 [GENERATION] Starting token generation...")
+            logger.info("-" * 60)
+            logger.info("🚀 [GENERATION] Starting token generation...")
 
-        try:
-            # Stream tokens from the model
-            for output in llm(
+            # Stream tokens from the model (decoded in a worker thread)
+            stream = _ThreadedStream(llm(
                 prompt,
                 max_tokens=settings.chat_max_tokens,
                 temperature=0.6,
@@ -224,9 +624,9 @@ class ChatService:
                 repeat_penalty=1.1,
                 stream=True,
                 stop=["<|im_end|>", "<|im_start|>"],
-            ):
-                token = output["choices"][0]["text"]
-                full_response += token
+            ))
+            async for token in stream:
+                parts.append(token)
                 token_count += 1
 
                 # Log first token latency
@@ -240,66 +640,83 @@ class ChatService:
                     elapsed = time.time() - start_time
                     logger.info(f"   📊 Progress: {token_count} tokens, {elapsed:.1f}s elapsed")
 
+                # Look for </think> in the new token plus a short lookback
+                transition = False
+                if think_end is None:
+                    window = tail + token
+                    idx = window.find(_THINK_CLOSE)
+                    if idx >= 0:
+                        think_end = text_len - len(tail) + idx + len(_THINK_CLOSE)
+                        transition = True
+                    else:
+                        tail = window[-(len(_THINK_CLOSE) - 1):]
+                        if in_thinking:
+                            unsent.append(token)
+                else:
+                    unsent.append(token)
+                text_len += len(token)
+
+                if transition:
+                    # The one join while streaming: split the text at the tag
+                    text = "".join(parts)
+                    parts = [text]
+                    unsent = [text[think_end:]]
+                    at_start = True
+
                 # Check for </think> tag transition
-                if in_thinking and "</think>" in full_response:
+                if in_thinking and transition:
                     in_thinking = False
                     thinking_time = time.time() - start_time
                     logger.info(f"   💭 Thinking phase complete ({thinking_time:.2f}s)")
 
-                    # Parse and send thinking content
-                    thinking, response = self._parse_thinking_simple(full_response)
+                    # Send thinking content
+                    thinking = text[:think_end - len(_THINK_CLOSE)].strip()
                     if thinking:
-                        yield f"data: {json.dumps({'type': 'thinking', 'content': thinking})}\n\n"
-                        last_sent_thinking_len = len(thinking)
+                        yield _sse(_THINKING_HEAD, thinking)
                         logger.info(f"   📤 Sent thinking: {len(thinking)} chars")
 
                     # Send any initial response content
+                    response = _take_stripped(unsent, at_start)
                     if response:
-                        yield f"data: {json.dumps({'type': 'response', 'content': response})}\n\n"
-                        last_sent_response_len = len(response)
-
-                    await asyncio.sleep(0)
+                        yield _sse(_RESPONSE_HEAD, response)
+                        at_start = False
 
                 # Stream thinking content in real-time (every N tokens during thinking)
                 elif in_thinking and token_count % settings.thinking_stream_batch_size == 0:
-                    current_thinking = full_response.strip()
-                    if len(current_thinking) > last_sent_thinking_len:
-                        new_thinking = current_thinking[last_sent_thinking_len:]
-                        yield f"data: {json.dumps({'type': 'thinking_stream', 'content': new_thinking})}\n\n"
-                        last_sent_thinking_len = len(current_thinking)
-                        await asyncio.sleep(0)
+                    new_thinking = _take_stripped(unsent, at_start)
+                    if new_thinking:
+                        yield _sse(_THINKING_STREAM_HEAD, new_thinking)
+                        at_start = False
 
                 # Stream response content (every batch_size tokens after thinking)
-                elif not in_thinking and token_count % settings.stream_batch_size == 0:
-                    _, response = self._parse_thinking_simple(full_response)
-                    if response and len(response) > last_sent_response_len:
-                        new_content = response[last_sent_response_len:]
-                        yield f"data: {json.dumps({'type': 'response', 'content': new_content})}\n\n"
-                        last_sent_response_len = len(response)
-                        await asyncio.sleep(0)
+                elif think_end is not None and token_count % settings.stream_batch_size == 0:
+                    new_content = _take_stripped(unsent, at_start)
+                    if new_content:
+                        yield _sse(_RESPONSE_HEAD, new_content)
+                        at_start = False
 
             # Final content
-            thinking, response = self._parse_thinking_simple(full_response)
+            text = "".join(parts)
+            if think_end is None:
+                thinking, response = text.strip(), ""
+            else:
+                thinking = text[:think_end - len(_THINK_CLOSE)].strip()
+                response = text[think_end:].strip()
 
             # Send any remaining thinking (if </think> was never found)
             if in_thinking and thinking:
-                yield f"data: {json.dumps({'type': 'thinking', 'content': thinking})}\n\n"
+                yield _sse(_THINKING_HEAD, thinking)
                 logger.info(f"   📤 Sent final thinking: {len(thinking)} chars")
 
             # Send remaining response content
-            if response and len(response) > last_sent_response_len:
-                new_content = response[last_sent_response_len:]
-                yield f"data: {json.dumps({'type': 'response', 'content': new_content})}\n\n"
+            if think_end is not None:
+                new_content = _take_stripped(unsent, at_start)
+                if new_content:
+                    yield _sse(_RESPONSE_HEAD, new_content)
 
             # Store in conversation history
-            self._conversations[conversation_id].append({
-                "role": "user",
-                "content": message
-            })
-            self._conversations[conversation_id].append({
-                "role": "assistant",
-                "content": response
-            })
+            self._append_turn(conversation_id, message, response)
+            await self._persist_turn(conversation_id)
 
             # Final stats
             elapsed = time.time() - start_time
@@ -313,14 +730,22 @@ class ChatService:
             logger.info("=" * 60)
 
             # Send done event
-            yield f"data: {json.dumps({'type': 'done', 'conversation_id': conversation_id})}\n\n"
+            yield _sse(_DONE_HEAD, conversation_id)
 
         except Exception as e:
             elapsed = time.time() - start_time
             logger.error(f"❌ [ERROR] Generation failed after {elapsed:.2f}s")
             logger.error(f"   Error: {str(e)}")
             logger.error("=" * 60)
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+            yield _sse(_ERROR_HEAD, str(e))
+
+        finally:
+            # The context goes back to the pool only once the worker thread
+            # is done with it (also when the client disconnected mid-stream)
+            if stream is None:
+                self._release_llm(llm)
+            else:
+                stream.close(lambda: self._release_llm(llm))
 
     async def get_response(
         self,
@@ -339,39 +764,44 @@ class ChatService:
         Returns:
             Dictionary with response, thinking, and conversation_id
         """
-        llm = self._get_llm()
-
-        if not conversation_id:
-            conversation_id = str(uuid.uuid4())
+        llm = await self._acquire_llm()
+        worker = None
+        try:
+            if not conversation_id:
+                conversation_id = str(uuid.uuid4())
 
-        if conversation_id not in self._conversations:
-            self._conversations[conversation_id] = []
+            await self._sync_conversation(conversation_id)
+            self._open_conversation(conversation_id)
 
-        prompt = self._build_prompt(message, conversation_id, enable_thinking)
+            prompt = self._build_prompt(message, conversation_id, enable_thinking)
 
-        # Generate complete response
-        output = llm(
-            prompt,
-            max_tokens=settings.chat_max_tokens,
-            temperature=0.6,
-            top_p=0.95,
-            top_k=20,
-            repeat_penalty=1.1,
-            stop=["<|im_end|>", "<|im_start|>"],
-        )
+            # Generate complete response in a worker thread
+            worker = asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                llm,
+                prompt,
+                max_tokens=settings.chat_max_tokens,
+                temperature=0.6,
+                top_p=0.95,
+                top_k=20,
+                repeat_penalty=1.1,
+                stop=["<|im_end|>", "<|im_start|>"],
+            ))
+        finally:
+            # The context goes back to the pool when the thread finishes, or
+            # right away if this request failed or was cancelled before
+            if worker is None:
+                self._release_llm(llm)
+            else:
+                worker.add_done_callback(lambda _: self._release_llm(llm))
+        # Shielded: a cancelled request leaves the thread running to the end
+        output = await asyncio.shield(worker)
 
         full_response = output["choices"][0]["text"]
         thinking, response = self._parse_thinking_simple(full_response)
 
         # Store in conversation history
-        self._conversations[conversation_id].append({
-            "role": "user",
-            "content": message
-        })
-        self._conversations[conversation_id].append({
-            "role": "assistant",
-            "content": response
-        })
+        self._append_turn(conversation_id, message, response)
+        await self._persist_turn(conversation_id)
 
         return {
             "response": response,
@@ -379,15 +809,22 @@ class ChatService:
             "conversation_id": conversation_id
         }
 
-    def clear_conversation(self, conversation_id: str) -> bool:
+    async def clear_conversation(self, conversation_id: str) -> bool:
         """Clear a specific conversation history."""
-        if conversation_id in self._conversations:
-            del self._conversations[conversation_id]
-            return True
-        return False
-
-    def get_conversation(self, conversation_id: str) -> Optional[List[dict]]:
-        """Get conversation history by ID."""
+        found = conversation_id in self._conversations
+        if found:
+            self._drop_conversation(conversation_id)
+        if self._redis is not None:
+            try:
+                found = bool(await self._redis.delete(_REDIS_KEY.format(conversation_id))) or found
+            except Exception as e:
+                logger.warning(f"⚠️ Redis delete failed: {e}")
+        return found
+
+    async def get_conversation(self, conversation_id: str) -> Optional[List[dict]]:
+        """Get conversation history by ID (None once it has been evicted)."""
+        await self._sync_conversation(conversation_id)
+        self._evict_conversations(time.monotonic())
         return self._conversations.get(conversation_id)
 
 
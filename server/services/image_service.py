@@ -75,6 +75,10 @@ class ImageService:
                 num_inference_steps=settings.image_inference_steps,
                 guidance_scale=settings.image_guidance_scale,
                 cache_dir=settings.model_cache_dir,
+                backend=settings.image_backend,
+                compile_model=settings.image_compile,
+                static_shape=(settings.default_image_size, settings.default_image_size),
+                low_memory=settings.image_low_memory,
             )
 
             # Trigger model loading
@@ -175,10 +179,9 @@ class ImageService:
                         from io import BytesIO
                         from PIL import Image
                         
-                        # Decode latents to image
+                        # Decode latents to image (at the VAE's precision)
                         with torch.no_grad():
-                            latents_scaled = 1 / 0.18215 * latents
-                            image = generator._pipeline.vae.decode(latents_scaled).sample
+                            image = generator.decode_latents(latents)
                             image = (image / 2 + 0.5).clamp(0, 1)
                             image = image.cpu().permute(0, 2, 3, 1).numpy()
                             image = (image[0] * 255).round().astype("uint8")
@@ -3,7 +3,7 @@
 """Multimodal Chat Service - Unified service for text, vision, and image generation"""
 
 import logging
-from typing import Dict, List, AsyncGenerator, Optional, Any
+from typing import Dict, List, AsyncGenerator, Optional, Any, Union
 from pathlib import Path
 import uuid
 
@@ -127,7 +127,7 @@ class MultimodalService:
         image_path: Optional[str] = None,
         image_id: Optional[str] = None,
         enable_thinking: bool = True,
-    ) -> AsyncGenerator[str, None]:
+    ) -> AsyncGenerator[Union[str, bytes], None]:
         """
         Stream multimodal response.
 
@@ -139,7 +139,7 @@ class MultimodalService:
             enable_thinking: Enable deep reasoning mode for text chat
 
         Yields:
-            SSE formatted events:
+            SSE formatted events (str, or bytes when forwarded from chat_service):
             - thinking: Model's thinking process
             - thinking_stream: Real-time thinking content
             - response: Text response content
@@ -270,7 +270,9 @@ class MultimodalService:
             image_id=image_id,
             enable_thinking=enable_thinking
         ):
-            # Parse SSE event
+            # Parse SSE event (chat_service events arrive as UTF-8 bytes)
+            if isinstance(event_str, bytes):
+                event_str = event_str.decode("utf-8")
             lines = event_str.strip().split('\n')
             event_type = None
             event_data = None
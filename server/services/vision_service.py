@@ -15,10 +15,10 @@ import os
 import sys
 import time
 import uuid
-import shutil
 from pathlib import Path
 from typing import AsyncGenerator, Optional, Dict
 
+import anyio
 from fastapi import UploadFile
 
 # Add parent directory to path for imports
@@ -46,6 +46,7 @@ class VisionService:
     """
 
     SUPPORTED_FORMATS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+    UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
 
     def __init__(self):
         self._handler = None
@@ -73,6 +74,8 @@ class VisionService:
             logger.info(f"   Max tokens: {settings.vision_max_tokens}")
             logger.info(f"   Min image size: {settings.vision_min_image_size}px")
             logger.info(f"   Max image size: {settings.vision_max_image_size}px")
+            logger.info(f"   Quantization: {settings.vision_quantization}")
+            logger.info(f"   Backend: {settings.vision_backend}")
             logger.info(f"   Device: cpu")
 
             load_start = time.time()
@@ -83,6 +86,11 @@ class VisionService:
                 max_new_tokens=settings.vision_max_tokens,
                 min_image_size=settings.vision_min_image_size,
                 max_image_size=settings.vision_max_image_size,
+                quantization=settings.vision_quantization,
+                backend=settings.vision_backend,
+                min_pixels=settings.vision_min_tokens * QwenVisionHandler.PIXELS_PER_TOKEN,
+                max_pixels=settings.vision_max_tokens_per_image * QwenVisionHandler.PIXELS_PER_TOKEN,
+                max_memory=settings.vision_max_memory or None,
             )
             self._handler.load_model()
 
@@ -139,18 +147,6 @@ class VisionService:
                 f"Supported: {', '.join(self.SUPPORTED_FORMATS)}"
             )
 
-        # Validate file size
-        content = await file.read()
-        file_size_kb = len(content) / 1024
-        logger.info(f"   File size: {file_size_kb:.1f} KB")
-
-        if len(content) > settings.max_upload_size:
-            logger.error(f"❌ File too large: {file_size_kb:.1f} KB > {settings.max_upload_size / 1024:.1f} KB")
-            logger.error("=" * 60)
-            raise ValueError(
-                f"File too large. Max size: {settings.max_upload_size / 1024 / 1024:.1f}MB"
-            )
-
         # Generate unique ID and save file
         image_id = str(uuid.uuid4())
         save_path = Path(settings.upload_dir) / f"{image_id}{ext}"
@@ -158,9 +154,26 @@ class VisionService:
         # Ensure upload directory exists
         save_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Save the file
-        with open(save_path, "wb") as f:
-            f.write(content)
+        # Stream the file to disk in chunks (async reads and writes keep the
+        # event loop free), validating the size as it arrives
+        file_size = 0
+        async with await anyio.open_file(save_path, "wb") as out:
+            while chunk := await file.read(self.UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > settings.max_upload_size:
+                    break
+                await out.write(chunk)
+
+        file_size_kb = file_size / 1024
+        logger.info(f"   File size: {file_size_kb:.1f} KB")
+
+        if file_size > settings.max_upload_size:
+            save_path.unlink(missing_ok=True)
+            logger.error(f"❌ File too large: > {settings.max_upload_size / 1024:.1f} KB")
+            logger.error("=" * 60)
+            raise ValueError(
+                f"File too large. Max size: {settings.max_upload_size / 1024 / 1024:.1f}MB"
+            )
 
         # Get image dimensions
         try:
@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Server Utilities Package"""
+
+from server.utils.sse import coalesce
+
+__all__ = ["coalesce"]